@@ -1 +1,148 @@
 # Categorizes news into sections (Research, Startups, Policy, etc.)
+# agents/categorizer_agent.py
+
+import re
+import zlib
+from typing import Dict, List, Optional
+import numpy as np
+from config.settings import CATEGORIZER_MIN_SCORE
+from utils.logger import setup_logger
+
+logger = setup_logger("categorizer_agent")
+
+# Section name -> descriptive vocabulary. Order is the order sections appear in.
+SECTIONS = {
+    "Research": (
+        "research researchers paper papers study studies arxiv scientists university lab labs "
+        "benchmark benchmarks dataset datasets training trained architecture accuracy results "
+        "algorithm algorithms neural network networks experiment breakthrough peer reviewed "
+        "reasoning evaluation open source weights parameters"
+    ),
+    "Startups": (
+        "startup startups funding raises raised round series seed venture capital investors "
+        "investment valuation founder founders cofounder acquisition acquires acquired deal "
+        "ipo revenue million billion unicorn backed investor stake merger"
+    ),
+    "Policy": (
+        "regulation regulations regulators regulatory law laws legislation policy policies "
+        "government congress senate parliament eu act ban bans lawmakers compliance copyright "
+        "lawsuit lawsuits court judge rules ruling privacy antitrust ftc safety executive order "
+        "election governance"
+    ),
+    "Products": (
+        "launch launches launched release releases released app apps feature features users "
+        "update available rollout product products chatbot assistant device devices pricing "
+        "subscription customers platform api beta announced announces smartphone"
+    ),
+}
+DEFAULT_SECTION = "Top Stories"
+
+FEATURE_DIM = 1 << 14
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in into is it its of on or that the their this "
+    "to was were will with said says new how what why who can more than about after over".split()
+)
+
+
+def _tokens(text: str) -> List[str]:
+    words = [w for w in _TOKEN_RE.findall(text.lower()) if w not in _STOPWORDS]
+    # Unigrams plus bigrams, so phrases like "series a" or "executive order" count
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def _hash(token: str) -> int:
+    # crc32 is stable across processes (unlike hash()) and fast for short strings
+    return zlib.crc32(token.encode("utf-8")) & (FEATURE_DIM - 1)
+
+
+def featurize(texts: List[str]):
+    """
+    Hashed bag-of-words features for a batch, as sparse (rows, cols, weights)
+    arrays with sublinear (1 + log tf) weights, L2-normalized per text.
+    Tokenizing is per text; counting, weighting and normalization run over
+    the whole batch at once.
+    """
+    rows, cols = [], []
+    for i, text in enumerate(texts):
+        hashed = [_hash(t) for t in _tokens(text)]
+        rows.extend([i] * len(hashed))
+        cols.extend(hashed)
+
+    keys, counts = np.unique(
+        np.asarray(rows, dtype=np.int64) * FEATURE_DIM + np.asarray(cols, dtype=np.int64),
+        return_counts=True,
+    )
+    rows, cols = keys // FEATURE_DIM, keys % FEATURE_DIM
+    weights = 1.0 + np.log(counts.astype(np.float32))
+    norms = np.sqrt(np.bincount(rows, weights=weights * weights, minlength=len(texts)))
+    weights /= np.maximum(norms[rows], 1e-12)
+    return rows, cols, weights
+
+
+def _dense(texts: List[str]) -> np.ndarray:
+    rows, cols, weights = featurize(texts)
+    matrix = np.zeros((len(texts), FEATURE_DIM), dtype=np.float32)
+    matrix[rows, cols] = weights
+    return matrix
+
+
+_centroids = None
+
+
+def _section_centroids() -> np.ndarray:
+    global _centroids
+    if _centroids is None:
+        _centroids = _dense(list(SECTIONS.values()))
+    return _centroids
+
+
+def _article_text(article: Dict) -> str:
+    title = article.get("title") or ""
+    # The title is repeated so it outweighs long, boilerplate-heavy bodies
+    return " ".join([title, title, article.get("description") or "", article.get("content") or ""])
+
+
+def section_scores(articles: List[Dict]) -> np.ndarray:
+    """Cosine similarity of each article to each section (len(articles) x len(SECTIONS))."""
+    if not articles:
+        return np.zeros((0, len(SECTIONS)), dtype=np.float32)
+    rows, cols, weights = featurize([_article_text(a) for a in articles])
+    # Sparse x dense product: sum weight * centroid value per (article, section)
+    contributions = weights[None, :] * _section_centroids()[:, cols]
+    return np.stack(
+        [np.bincount(rows, weights=c, minlength=len(articles)) for c in contributions], axis=1
+    ).astype(np.float32)
+
+
+def categorize_articles(articles: List[Dict], min_score: Optional[float] = None) -> Dict[str, str]:
+    """
+    Assign each article to one of SECTIONS with a local hashed-feature
+    classifier (no LLM call). Articles whose best similarity is below
+    `min_score` (default CATEGORIZER_MIN_SCORE) go to DEFAULT_SECTION.
+
+    Returns {url: section}.
+    """
+    min_score = CATEGORIZER_MIN_SCORE if min_score is None else min_score
+    scores = section_scores(articles)
+    names = list(SECTIONS)
+
+    categories = {}
+    if len(articles):
+        best = scores.argmax(axis=1)
+        best_score = scores[np.arange(len(articles)), best]
+        for article, idx, score in zip(articles, best, best_score):
+            url = article.get("url")
+            if url:
+                categories[url] = names[idx] if score >= min_score else DEFAULT_SECTION
+
+    counts = {}
+    for section in categories.values():
+        counts[section] = counts.get(section, 0) + 1
+    logger.info(f"Categorized {len(categories)} articles: {counts}")
+    return categories
+
+
+def section_order() -> List[str]:
+    """Sections in display order, with the fallback section last."""
+    return list(SECTIONS) + [DEFAULT_SECTION]
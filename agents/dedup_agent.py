@@ -0,0 +1,114 @@
+# Collapses near-duplicate (syndicated) articles before summarization
+# agents/dedup_agent.py
+
+import hashlib
+import random
+import re
+from collections import defaultdict
+from typing import Dict, List, Optional
+from utils.logger import setup_logger
+
+logger = setup_logger("dedup_agent")
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Fixed seed so signatures are comparable across runs and processes
+_rng = random.Random(0x5EED)
+_PERM_MASKS = [_rng.getrandbits(64) for _ in range(NUM_PERM)]
+
+
+def _shingles(text: str, size: int) -> set:
+    tokens = _TOKEN_RE.findall(text.lower())
+    if len(tokens) < size:
+        return {" ".join(tokens)} if tokens else set()
+    return {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+
+def _hash64(shingle: str) -> int:
+    return int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def minhash_signature(text: str, shingle_size: int = 3) -> Optional[List[int]]:
+    """MinHash signature of the word shingles of `text` (XOR-mask permutations)."""
+    hashes = [_hash64(s) for s in _shingles(text, shingle_size)]
+    if not hashes:
+        return None
+    return [min(h ^ mask for h in hashes) for mask in _PERM_MASKS]
+
+
+def _similarity(sig_a: List[int], sig_b: List[int]) -> float:
+    return sum(a == b for a, b in zip(sig_a, sig_b)) / NUM_PERM
+
+
+def dedupe_articles(articles: List[Dict], threshold: float = 0.5, shingle_size: int = 3) -> List[Dict]:
+    """
+    Cluster near-duplicate articles by MinHash similarity of title + description
+    and keep one representative per cluster.
+
+    Candidate pairs come from LSH banding (BANDS x ROWS), so the cost grows with
+    the number of colliding pairs rather than all n^2 pairs; each candidate is
+    confirmed by its estimated Jaccard similarity against `threshold`.
+    The representative is the copy with the most text; the others are recorded
+    under its "duplicates" key as {title, url, source}.
+    """
+    if len(articles) < 2:
+        return list(articles)
+
+    signatures = [
+        minhash_signature(f"{a.get('title') or ''} {a.get('description') or ''}", shingle_size)
+        for a in articles
+    ]
+
+    parent = list(range(len(articles)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for band in range(BANDS):
+        buckets = defaultdict(list)
+        for idx, sig in enumerate(signatures):
+            if sig is not None:
+                buckets[tuple(sig[band * ROWS:(band + 1) * ROWS])].append(idx)
+        for members in buckets.values():
+            for pos, a in enumerate(members):
+                for b in members[pos + 1:]:
+                    root_a, root_b = find(a), find(b)
+                    if root_a == root_b:
+                        continue
+                    if _similarity(signatures[a], signatures[b]) >= threshold:
+                        parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    clusters = defaultdict(list)
+    for idx in range(len(articles)):
+        clusters[find(idx)].append(idx)
+
+    def text_len(idx):
+        a = articles[idx]
+        return len(a.get("content") or "") + len(a.get("description") or "")
+
+    kept = []
+    # Keep clusters in order of their first member so the feed order is preserved
+    for members in sorted(clusters.values(), key=lambda m: m[0]):
+        best = max(members, key=lambda i: (text_len(i), -i))
+        rep = dict(articles[best])
+        alternates = [
+            {
+                "title": articles[i].get("title"),
+                "url": articles[i].get("url"),
+                "source": articles[i].get("source"),
+            }
+            for i in members if i != best
+        ]
+        if alternates:
+            rep["duplicates"] = alternates
+        kept.append(rep)
+
+    logger.info(f"Deduplicated {len(articles)} articles into {len(kept)} clusters.")
+    return kept
@@ -3,12 +3,17 @@
 
 import os
 import json
-import requests
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone, timedelta
 from pathlib import Path
-from typing import List, Dict
+from typing import Dict, Iterable, Iterator, List, Optional, Union
 from dotenv import load_dotenv
+from utils.api_utils import get_http_session
+from utils.fetch_archive import get_fetch_archive
 from utils.logger import setup_logger
+from utils.metrics import current_metrics
+from utils.response_cache import ResponseCache
 
 # Setup logger
 logger = setup_logger("fetcher_agent")
@@ -22,58 +27,77 @@ except Exception:
     NEWS_API_KEY = os.getenv("NEWS_API_KEY")
     TOPIC = os.getenv("TOPIC", "Artificial Intelligence")
 
+try:
+    from config.settings import (
+        NEWSAPI_ENDPOINT, FETCHER_MAX_WORKERS, NEWSAPI_CACHE_TTL_SECONDS, FETCH_ARCHIVE_ENABLED,
+        FETCH_QUERIES,
+    )
+except Exception:
+    FETCH_QUERIES = os.getenv("FETCH_QUERIES", "")
+    NEWSAPI_ENDPOINT = os.getenv("NEWSAPI_ENDPOINT", "https://newsapi.org/v2/everything")
+    FETCHER_MAX_WORKERS = int(os.getenv("FETCHER_MAX_WORKERS", "8"))
+    NEWSAPI_CACHE_TTL_SECONDS = int(os.getenv("NEWSAPI_CACHE_TTL_SECONDS", "900"))
+    FETCH_ARCHIVE_ENABLED = os.getenv("FETCH_ARCHIVE_ENABLED", "true").lower() == "true"
+
 CACHE_DIR = Path("data/cache")
 CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
-NEWSAPI_ENDPOINT = "https://newsapi.org/v2/everything"
-
+# Responses for identical (normalized) requests are reused within the TTL
+response_cache = ResponseCache(CACHE_DIR / "newsapi", ttl_seconds=NEWSAPI_CACHE_TTL_SECONDS)
 
-def _save_raw(response_json: dict, fname: str = "latest_fetch.json"):
-    """Save raw NewsAPI response for debugging."""
-    path = CACHE_DIR / fname
-    with path.open("w", encoding="utf-8") as f:
-        json.dump(response_json, f, ensure_ascii=False, indent=2)
-    logger.info(f"Raw response saved to {path}")
+def _save_raw(response_json: dict, query: Optional[str] = None, page: Optional[int] = None):
+    """Append the raw NewsAPI response to the day's fetch archive for replay and debugging."""
+    if not FETCH_ARCHIVE_ENABLED:
+        return
+    try:
+        entry = get_fetch_archive().append(response_json, query=query, page=page)
+    except OSError as e:
+        logger.warning(f"Could not archive raw NewsAPI response: {e}")
+        return
+    logger.info(f"Raw response archived ({entry['segment']} @ {entry['offset']}, id={entry['id']})")
+
+
+def _clean(a: dict) -> Dict:
+    return {
+        "title": a.get("title"),
+        "description": a.get("description"),
+        "url": a.get("url"),
+        "source": (a.get("source") or {}).get("name"),
+        "publishedAt": a.get("publishedAt"),
+        "content": a.get("content"),
+    }
 
 
-def run_fetcher(
-    query: str = None,
-    page_size: int = 10,
-    from_days: int = 2,
-    language: str = "en",
-) -> List[Dict]:
+def _fetch_page(query: str, page: int, page_size: int, language: str, use_cache: bool = True,
+                metrics=None) -> dict:
     """
-    Fetch news articles from NewsAPI.org.
-
-    Returns:
-        List of dicts with keys: title, description, url, source, publishedAt, content
+    Fetch a single page of results for one query over the shared session,
+    serving it from the response cache when the same request ran recently.
     """
-    logger.info("🚀 Fetcher started")
-
-    if query is None:
-        query = TOPIC or "Artificial Intelligence"
-    logger.info(f"Fetching news for topic: {query}")
-
-    if not NEWS_API_KEY:
-        logger.error("NEWS_API_KEY not found in environment.")
-        raise RuntimeError("NEWS_API_KEY environment variable not set. Add it to your .env")
-
-    # Limit time window to reduce noisy old results
-    dt_from = (datetime.now(timezone.utc) - timedelta(days=from_days)).isoformat()
-
     params = {
         "q": query,
         "pageSize": page_size,
+        "page": page,
         "language": language,
         "sortBy": "publishedAt",
         # "from": dt_from,  # Uncomment if needed
     }
 
+    cache_params = dict(params, endpoint=NEWSAPI_ENDPOINT)
+    if use_cache:
+        cached = response_cache.get(cache_params)
+        if cached is not None:
+            logger.info(f"NewsAPI response served from cache (q={query!r}, page={page}).")
+            return cached
+
     headers = {"Authorization": NEWS_API_KEY}
 
     try:
-        resp = requests.get(NEWSAPI_ENDPOINT, params=params, headers=headers, timeout=15)
-        logger.info("NewsAPI request sent successfully.")
+        started = time.perf_counter()
+        resp = get_http_session().get(NEWSAPI_ENDPOINT, params=params, headers=headers, timeout=15)
+        if metrics is not None:
+            metrics.record_http_request(time.perf_counter() - started)
+        logger.info(f"NewsAPI request sent successfully (q={query!r}, page={page}).")
     except Exception as e:
         logger.error(f"❌ Failed to call NewsAPI: {e}")
         raise RuntimeError(f"Failed to call NewsAPI: {e}")
@@ -83,21 +107,119 @@ def run_fetcher(
         raise RuntimeError(f"NewsAPI returned status {resp.status_code}: {resp.text}")
 
     data = resp.json()
-    _save_raw(data)
-
-    articles = data.get("articles", [])
-    logger.info(f"Fetched {len(articles)} articles from NewsAPI.")
-
-    cleaned = []
-    for a in articles:
-        cleaned.append({
-            "title": a.get("title"),
-            "description": a.get("description"),
-            "url": a.get("url"),
-            "source": a.get("source", {}).get("name"),
-            "publishedAt": a.get("publishedAt"),
-            "content": a.get("content"),
-        })
+    _save_raw(data, query=query, page=page)
+    if use_cache:
+        response_cache.put(cache_params, data)
+    return data
+
+
+def iter_articles(
+    queries: Optional[Iterable[str]] = None,
+    page_size: int = 10,
+    pages: int = 1,
+    language: str = "en",
+    max_workers: Optional[int] = None,
+    use_cache: bool = True,
+) -> Iterator[Dict]:
+    """
+    Fetch every (query, page) pair concurrently and yield cleaned articles
+    as each response arrives, skipping URLs that were already yielded.
+
+    A failure on the first page of a query is raised; failures on later pages
+    (e.g. NewsAPI's result cap on free plans) are logged and skipped.
+    """
+    if not NEWS_API_KEY:
+        logger.error("NEWS_API_KEY not found in environment.")
+        raise RuntimeError("NEWS_API_KEY environment variable not set. Add it to your .env")
+
+    queries = list(dict.fromkeys(queries or [TOPIC or "Artificial Intelligence"]))
+    jobs = [(q, p) for q in queries for p in range(1, max(1, pages) + 1)]
+    workers = max(1, min(max_workers or FETCHER_MAX_WORKERS, len(jobs)))
+
+    metrics = current_metrics()
+    seen = set()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(_fetch_page, q, p, page_size, language, use_cache, metrics): (q, p)
+            for q, p in jobs
+        }
+        try:
+            for future in as_completed(futures):
+                query, page = futures[future]
+                try:
+                    data = future.result()
+                except RuntimeError:
+                    if page == 1:
+                        raise
+                    logger.warning(f"Skipping page {page} for {query!r} after NewsAPI error.")
+                    continue
+
+                articles = data.get("articles", [])
+                logger.info(f"Fetched {len(articles)} articles from NewsAPI (q={query!r}, page={page}).")
+                for a in articles:
+                    key = a.get("url") or a.get("title")
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    yield _clean(a)
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def queries_for_topic(topic: Optional[str] = None, extra: Optional[Iterable[str]] = None,
+                      raw: Optional[str] = None) -> List[str]:
+    """
+    The topic followed by its sub-topic queries, without duplicates.
+
+    `extra` (e.g. a scheduled job's "queries") takes precedence over
+    FETCH_QUERIES, which is either a JSON list of queries for TOPIC or a
+    JSON object mapping topics to query lists.
+    """
+    topic = topic or TOPIC or "Artificial Intelligence"
+    if extra is None:
+        raw = FETCH_QUERIES if raw is None else raw
+        configured = json.loads(raw) if raw and raw.strip() else []
+        if isinstance(configured, dict):
+            extra = configured.get(topic, [])
+        else:
+            extra = configured if topic == (TOPIC or "Artificial Intelligence") else []
+    return list(dict.fromkeys([topic, *extra]))
+
+
+def run_fetcher(
+    query: Union[str, List[str], None] = None,
+    page_size: int = 10,
+    from_days: int = 2,
+    language: str = "en",
+    pages: int = 1,
+    max_workers: Optional[int] = None,
+    use_cache: bool = True,
+) -> List[Dict]:
+    """
+    Fetch news articles from NewsAPI.org.
+
+    `query` may be a single query or a list of sub-topic queries; all queries
+    and pages are fetched concurrently over one keep-alive session and merged,
+    deduplicated by URL. Identical requests made within NEWSAPI_CACHE_TTL_SECONDS
+    are answered from the local response cache unless `use_cache` is False.
+
+    Returns:
+        List of dicts with keys: title, description, url, source, publishedAt, content
+    """
+    logger.info("🚀 Fetcher started")
+
+    if query is None:
+        query = TOPIC or "Artificial Intelligence"
+    queries = [query] if isinstance(query, str) else list(query)
+    logger.info(f"Fetching news for topic(s): {', '.join(queries)} ({pages} page(s) each)")
+
+    # Limit time window to reduce noisy old results
+    dt_from = (datetime.now(timezone.utc) - timedelta(days=from_days)).isoformat()
+
+    cleaned = list(iter_articles(queries, page_size=page_size, pages=pages,
+                                 language=language, max_workers=max_workers,
+                                 use_cache=use_cache))
 
     logger.info(f"✅ Fetcher completed. {len(cleaned)} articles cleaned and returned.")
     return cleaned
@@ -2,23 +2,74 @@
 # agents/mailer_agent.py
 
 import os
-import json
-import smtplib
+import time
+import hashlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from dotenv import load_dotenv
 from pathlib import Path
+from config.settings import (
+    SMTP_HOST,
+    SMTP_PORT,
+    SMTP_STARTTLS,
+    SMTP_AUTH,
+    SMTP_POOL_SIZE,
+    MAILER_RATE_LIMIT,
+    MAILER_MAX_ATTEMPTS,
+    MAILER_RETRY_BASE_SECONDS,
+    MAILER_RETRY_MAX_SECONDS,
+    MAILER_SHARDS,
+    TOPIC,
+)
+from utils.db_utils import get_subscriber_store
+from utils.delivery_log import DB_PATH as DELIVERY_DB_PATH, DeliveryLog, get_delivery_log
+from utils.email_utils import (
+    PreparedNewsletter,
+    RateLimiter,
+    SMTPConnectionPool,
+    backoff_delay,
+    classify_smtp_error,
+)
+from utils.metrics import current_metrics
 
 load_dotenv()
 
 EMAIL_USER = os.getenv("EMAIL_USER")
 EMAIL_PASS = os.getenv("EMAIL_PASS")
 
-DATA_PATH = Path("data/subscribers.json")
 NEWSLETTER_PATH = Path("data/cache/newsletter.html")
 
-def send_email(to_email, subject, html_content):
-    """Send one HTML email via Gmail SMTP."""
+# Closing line of the newsletter that gets personalized per subscriber
+PERSONALIZATION_MARKER = "Stay tuned for more AI insights!"
+
+
+def personalized_closing(name):
+    return f"Stay tuned for more AI insights, {name}!"
+
+
+def subject_for_topic(topic=None):
+    """Email subject for a topic's issue; the default topic keeps the classic subject."""
+    if not topic or topic == TOPIC:
+        return "Your Daily AI Newsletter"
+    return f"Your Daily AI Newsletter: {topic}"
+
+
+def create_smtp_pool(pool_size=None):
+    """Build an SMTP session pool from the configured host, port and credentials."""
+    return SMTPConnectionPool(
+        SMTP_HOST,
+        SMTP_PORT,
+        user=EMAIL_USER if SMTP_AUTH else None,
+        password=EMAIL_PASS if SMTP_AUTH else None,
+        size=pool_size or SMTP_POOL_SIZE,
+        starttls=SMTP_STARTTLS,
+    )
+
+
+def send_email(to_email, subject, html_content, pool=None):
+    """Send one HTML email over SMTP, reusing a session from `pool` when given."""
     try:
         msg = MIMEMultipart("alternative")
         msg["From"] = EMAIL_USER
@@ -27,50 +78,191 @@ def send_email(to_email, subject, html_content):
 
         msg.attach(MIMEText(html_content, "html"))
 
-        with smtplib.SMTP("smtp.gmail.com", 587) as server:
-            server.starttls()
-            server.login(EMAIL_USER, EMAIL_PASS)
-            server.send_message(msg)
+        if pool is not None:
+            pool.send_message(msg)
+        else:
+            with create_smtp_pool(pool_size=1) as one_off:
+                one_off.send_message(msg)
         return True
     except Exception as e:
         print(f"❌ Failed to send to {to_email}: {e}")
         return False
 
-def run_mailer(subject="Your Daily AI Newsletter"):
-    """Send newsletter.html to all subscribers."""
-    if not EMAIL_USER or not EMAIL_PASS:
+def check_mailer_ready():
+    """Validate mail settings and the subscriber list; returns the subscriber count."""
+    if SMTP_AUTH and (not EMAIL_USER or not EMAIL_PASS):
         raise ValueError("Missing EMAIL_USER or EMAIL_PASS in .env")
 
-    if not NEWSLETTER_PATH.exists():
-        raise FileNotFoundError("Newsletter HTML not found. Run writer_agent first.")
+    return get_subscriber_store().count()
 
-    # Load newsletter HTML
-    html_content = NEWSLETTER_PATH.read_text(encoding="utf-8")
+def newsletter_id_for(html_content, subject):
+    """Stable ID for one issue, so re-running the same send resumes it."""
+    return hashlib.sha256(f"{subject}\n{html_content}".encode("utf-8")).hexdigest()[:16]
 
-    # Load subscribers
-    with open(DATA_PATH, "r", encoding="utf-8") as f:
-        subscribers = json.load(f)
+def _prepare(html_content, subject):
+    # Encode the shared body once; each message only adds headers and the closing line
+    return PreparedNewsletter(
+        html_content,
+        subject,
+        EMAIL_USER,
+        marker=PERSONALIZATION_MARKER,
+        personalize=personalized_closing,
+    )
 
-    print(f"📧 Sending newsletter to {len(subscribers)} subscribers...")
+def _drain_queue(log, newsletter_id, prepared, pool_size, rate_limit, max_attempts,
+                 record_send, shard=None):
+    """
+    Send every due delivery of `newsletter_id` (restricted to `shard`, if given)
+    until none are pending, sleeping through retry backoffs.
+    record_send(latency, ok) is called once per SMTP attempt.
+    Returns (sent, failed).
+    """
+    limiter = RateLimiter(rate_limit)
+
+    def send_one(row):
+        email = row["email"]
+        name = row.get("name") or "Subscriber"
+        limiter.acquire()
+        started = time.perf_counter()
+        try:
+            pool.sendmail(prepared.from_addr, [email], prepared.render(email, name))
+        except Exception as e:
+            record_send(time.perf_counter() - started, False)
+            attempt = row["attempts"] + 1
+            transient, retry_after = classify_smtp_error(e)
+            if transient and attempt < max_attempts:
+                delay = backoff_delay(attempt, MAILER_RETRY_BASE_SECONDS,
+                                      MAILER_RETRY_MAX_SECONDS, retry_after)
+                log.mark_retry(newsletter_id, email, e, delay)
+                print(f"⏳ Retrying {email} in {delay:.0f}s (attempt {attempt}): {e}")
+                return None
+            log.mark_failed(newsletter_id, email, e, transient=transient)
+            print(f"❌ Failed to send to {email}: {e}")
+            return False
+
+        record_send(time.perf_counter() - started, True)
+        log.mark_sent(newsletter_id, email)
+        return True
 
     success, failed = 0, 0
-    for sub in subscribers:
-        name = sub.get("name", "Subscriber")
-        email = sub.get("email")
-        if not email:
-            continue
-
-        personalized_html = html_content.replace(
-            "Stay tuned for more AI insights!",
-            f"Stay tuned for more AI insights, {name}!"
+    with create_smtp_pool(pool_size) as pool:
+        with ThreadPoolExecutor(max_workers=pool.size) as executor:
+            while True:
+                # Claim a bounded batch so only a few sends are in flight at once
+                batch = log.claim_due(newsletter_id, limit=pool.size * 4, shard=shard)
+                if not batch:
+                    next_due = log.next_due_at(newsletter_id, shard=shard)
+                    if next_due is None:
+                        break
+                    time.sleep(min(max(0.0, next_due - time.time()), MAILER_RETRY_MAX_SECONDS))
+                    continue
+
+                for sent in executor.map(send_one, batch):
+                    if sent is True:
+                        success += 1
+                    elif sent is False:
+                        failed += 1
+    return success, failed
+
+def _send_shard(newsletter_id, subject, html_content, shard, pool_size, rate_limit, max_attempts):
+    """
+    Process-pool worker: drain one shard of the queue with its own SMTP
+    sessions and delivery log connection. Returns counts plus the raw
+    (latency, ok) samples so the parent can merge them into its metrics.
+    """
+    log = DeliveryLog(DELIVERY_DB_PATH)
+    samples = []
+    try:
+        sent, failed = _drain_queue(
+            log, newsletter_id, _prepare(html_content, subject), pool_size,
+            rate_limit, max_attempts, lambda latency, ok: samples.append((latency, ok)),
+            shard=shard,
         )
+    finally:
+        log.close()
+    return {"sent": sent, "failed": failed, "smtp_samples": samples}
 
-        if send_email(email, subject, personalized_html):
-            success += 1
-        else:
-            failed += 1
+def run_mailer(subject="Your Daily AI Newsletter", pool_size=None, newsletter_id=None,
+               rate_limit=None, max_attempts=None, shards=None, html_content=None):
+    """
+    Send newsletter.html (or `html_content`, when given) to all subscribers
+    through the durable send queue.
+
+    Recipients are enqueued in the delivery log under `newsletter_id`
+    (derived from subject + HTML by default) and only marked sent once the
+    SMTP server accepted the message, so re-running after a crash resumes
+    where it stopped without double-sending. Transient failures are retried
+    with exponential backoff (honoring retry hints in the server reply), and
+    sends are throttled to `rate_limit` messages per second. Recipients
+    whose transient failures exhaust `max_attempts` are left 'deferred' and
+    retried from scratch by the next run for the same newsletter.
+
+    With shards > 1 (default MAILER_SHARDS) the queue is split across that
+    many worker processes, each with its own pool of `pool_size` SMTP
+    sessions, so MIME rendering and TLS scale with CPU cores. The overall
+    rate limit is divided evenly between the shards.
+
+    Returns {"newsletter_id", "sent", "failed", "deferred", "already_sent"}.
+    """
+    if SMTP_AUTH and (not EMAIL_USER or not EMAIL_PASS):
+        raise ValueError("Missing EMAIL_USER or EMAIL_PASS in .env")
+
+    if html_content is None:
+        if not NEWSLETTER_PATH.exists():
+            raise FileNotFoundError("Newsletter HTML not found. Run writer_agent first.")
+
+        # Load newsletter HTML
+        html_content = NEWSLETTER_PATH.read_text(encoding="utf-8")
+
+    newsletter_id = newsletter_id or newsletter_id_for(html_content, subject)
+    rate_limit = MAILER_RATE_LIMIT if rate_limit is None else rate_limit
+    max_attempts = max_attempts or MAILER_MAX_ATTEMPTS
+    shards = max(1, shards or MAILER_SHARDS)
+
+    # Queue every active subscriber once; rows from an earlier run are kept as-is
+    log = get_delivery_log()
+    log.requeue_inflight(newsletter_id)
+    log.enqueue(newsletter_id, get_subscriber_store().iter_subscribers())
+    counts = log.counts(newsletter_id)
+    already_sent = counts.get("sent", 0)
+
+    print(f"📧 Sending newsletter {newsletter_id} to {counts.get('pending', 0)} subscribers "
+          f"({already_sent} already sent, {shards} shard(s))...")
+    metrics = current_metrics()
+
+    def record_send(latency, ok):
+        if metrics is not None:
+            metrics.record_smtp_send(latency, ok=ok)
+
+    if shards == 1:
+        success, failed = _drain_queue(
+            log, newsletter_id, _prepare(html_content, subject), pool_size,
+            rate_limit, max_attempts, record_send,
+        )
+    else:
+        success, failed = 0, 0
+        # spawn, not fork: the parent holds open SQLite connections and threads
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=shards, mp_context=context) as executor:
+            futures = [
+                executor.submit(
+                    _send_shard, newsletter_id, subject, html_content, (index, shards),
+                    pool_size, rate_limit / shards, max_attempts,
+                )
+                for index in range(shards)
+            ]
+            for future in futures:
+                result = future.result()
+                success += result["sent"]
+                failed += result["failed"]
+                for latency, ok in result["smtp_samples"]:
+                    record_send(latency, ok)
 
-    print(f"✅ Sent: {success}, ❌ Failed: {failed}")
+    # Transient failures that ran out of attempts; the next run re-queues them
+    deferred = log.counts(newsletter_id).get("deferred", 0)
+    print(f"✅ Sent: {success}, ❌ Failed: {failed} ({deferred} deferred)")
+    return {"newsletter_id": newsletter_id, "sent": success, "failed": failed,
+            "deferred": deferred, "already_sent": already_sent}
 
 # Test run
 if __name__ == "__main__":
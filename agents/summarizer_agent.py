@@ -1,34 +1,36 @@
 # Summarizes fetched AI news
 # agents/summarizer_agent.py
 
-import os
 import json
+import re
+from functools import lru_cache
 from dotenv import load_dotenv
 from pathlib import Path
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
+from config.settings import (
+    SUMMARIZER_MAX_CONCURRENCY,
+    SUMMARY_CACHE_ENABLED,
+    SUMMARY_CACHE_TTL_SECONDS,
+    SUMMARY_CACHE_MAX_ENTRIES,
+    SUMMARIZER_MODE,
+    SUMMARIZER_BATCH_TOKEN_BUDGET,
+    SUMMARIZER_BATCH_MAX_ARTICLES,
+)
+from utils.api_utils import get_llm
+from utils.logger import setup_logger
+from utils.metrics import current_metrics
+from utils.summary_cache import SummaryCache, summary_cache_key
 
 load_dotenv()
 
-# Get keys from .env
-api_key = os.getenv("OPENROUTER_API_KEY")
-base_url = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+logger = setup_logger("summarizer_agent")
 
-if not api_key:
-    raise ValueError("OPENROUTER_API_KEY missing in .env")
+MODEL_NAME = "meta-llama/llama-3-8b-instruct"
 
-# Initialize LLM (OpenRouter model)
-llm = ChatOpenAI(
-    model="meta-llama/llama-3-8b-instruct",
-    temperature=0.7,
-    max_tokens=256,
-    api_key=api_key,
-    base_url=base_url,
-)
+# Bump whenever SUMMARY_PROMPT changes so cached summaries are not reused
+PROMPT_VERSION = "v1"
 
-# Define prompt template for summarization
-prompt_template = ChatPromptTemplate.from_template("""
+# Prompt template for summarization
+SUMMARY_PROMPT = """
 Summarize the following news article in about 2-3 sentences.
 Keep the tone professional and informative.
 Avoid unnecessary details or promotional content.
@@ -37,35 +39,238 @@ Title: {title}
 Content: {content}
 
 Return only the summary text.
-""")
+"""
+
+# Several articles per request; the model answers with one JSON slot per index.
+# Summaries follow the same 2-3 sentence brief, so they share the cache with
+# SUMMARY_PROMPT results.
+BATCH_SUMMARY_PROMPT = """
+Summarize each of the following news articles in about 2-3 sentences.
+Keep the tone professional and informative.
+Avoid unnecessary details or promotional content.
+
+Return ONLY a JSON object that maps each article's number (as a string) to its
+summary, for example {{"0": "Summary of article 0.", "1": "Summary of article 1."}}.
+Include every article number exactly once. No markdown, no text outside the JSON.
+
+{articles}
+"""
+
+# Rough prompt size estimate; only used to pack batches
+CHARS_PER_TOKEN = 4
+BATCH_PROMPT_OVERHEAD_TOKENS = 120
+# Output allowance per article in a batch, same as the single-article max_tokens
+TOKENS_PER_SUMMARY = 256
+
+
+@lru_cache(maxsize=None)
+def get_chain():
+    """Build the summarization chain on first use (prompt | OpenRouter LLM | parser)."""
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_core.output_parsers import StrOutputParser
+
+    prompt_template = ChatPromptTemplate.from_template(SUMMARY_PROMPT)
+    llm = get_llm(MODEL_NAME, temperature=0.7, max_tokens=256)
+    return prompt_template | llm | StrOutputParser()
+
 
-output_parser = StrOutputParser()
+@lru_cache(maxsize=None)
+def get_batch_chain(max_articles):
+    """Chain for BATCH_SUMMARY_PROMPT with room for `max_articles` summaries."""
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_core.output_parsers import StrOutputParser
+
+    prompt_template = ChatPromptTemplate.from_template(BATCH_SUMMARY_PROMPT)
+    llm = get_llm(MODEL_NAME, temperature=0.7, max_tokens=TOKENS_PER_SUMMARY * max_articles)
+    return prompt_template | llm | StrOutputParser()
 
 CACHE_DIR = Path("data/cache")
 CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
+_summary_cache = None
+
+
+def get_summary_cache():
+    """Return the shared summary cache, opening it on first use."""
+    global _summary_cache
+    if _summary_cache is None:
+        _summary_cache = SummaryCache(
+            CACHE_DIR / "summaries.sqlite3",
+            ttl_seconds=SUMMARY_CACHE_TTL_SECONDS,
+            max_entries=SUMMARY_CACHE_MAX_ENTRIES,
+        )
+    return _summary_cache
+
+
+def summary_inputs(article):
+    """Prompt inputs and cache key for one article, or (None, None) if it has no text."""
+    # The fetcher always sets "title", possibly to None
+    title = article.get("title") or "Untitled"
+    content = article.get("description") or article.get("content") or ""
+    if not content:
+        return None, None
+    key = summary_cache_key(article.get("url"), title, content, MODEL_NAME, PROMPT_VERSION)
+    return {"title": title, "content": content}, key
+
 
-def summarize_articles(articles):
+def _estimate_tokens(inputs):
+    return (len(inputs["title"]) + len(inputs["content"])) // CHARS_PER_TOKEN + 10
+
+
+def pack_batches(inputs_list, token_budget=None, max_articles=None):
+    """
+    Greedily group prompt inputs into batches of at most `max_articles`
+    whose estimated prompt size stays within `token_budget`.
+    Returns lists of indices into inputs_list.
+    """
+    token_budget = token_budget or SUMMARIZER_BATCH_TOKEN_BUDGET
+    max_articles = max_articles or SUMMARIZER_BATCH_MAX_ARTICLES
+    batches, current, used = [], [], BATCH_PROMPT_OVERHEAD_TOKENS
+    for i, inputs in enumerate(inputs_list):
+        cost = _estimate_tokens(inputs)
+        if current and (len(current) >= max_articles or used + cost > token_budget):
+            batches.append(current)
+            current, used = [], BATCH_PROMPT_OVERHEAD_TOKENS
+        current.append(i)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _format_batch(inputs_list):
+    return "\n\n".join(
+        f"ARTICLE {n}\nTitle: {inputs['title']}\nContent: {inputs['content']}"
+        for n, inputs in enumerate(inputs_list)
+    )
+
+
+_JSON_OBJECT_RE = re.compile(r"\{.*\}", re.DOTALL)
+
+
+def parse_batch_output(text, count):
+    """
+    Extract the {"0": summary, ...} object from a batch reply.
+    Returns a list of `count` summaries, with None for missing or malformed slots.
+    """
+    slots = [None] * count
+    match = _JSON_OBJECT_RE.search(text or "")
+    if not match:
+        return slots
+    try:
+        data = json.loads(match.group(0))
+    except ValueError:
+        return slots
+    if not isinstance(data, dict):
+        return slots
+    for n in range(count):
+        value = data.get(str(n))
+        if isinstance(value, str) and value.strip():
+            slots[n] = value.strip()
+    return slots
+
+
+def _summarize_batched(inputs_list, config):
+    """
+    Summarize with multi-article requests. Articles whose slot is missing or
+    malformed (or whose whole batch failed) are retried one per request.
+    Returns (outputs, requests, retried): one summary string or Exception
+    per input in order, the number of batched requests, and how many
+    articles needed an individual retry.
+    """
+    batches = pack_batches(inputs_list)
+    chain = get_batch_chain(max(len(b) for b in batches))
+    replies = chain.batch(
+        [{"articles": _format_batch([inputs_list[i] for i in batch])} for batch in batches],
+        config=config,
+        return_exceptions=True,
+    )
+
+    outputs = [None] * len(inputs_list)
+    for batch, reply in zip(batches, replies):
+        if isinstance(reply, Exception):
+            continue
+        for i, summary in zip(batch, parse_batch_output(reply, len(batch))):
+            outputs[i] = summary
+
+    retry = [i for i, out in enumerate(outputs) if out is None]
+    if retry:
+        retried = get_chain().batch([inputs_list[i] for i in retry], config=config, return_exceptions=True)
+        for i, out in zip(retry, retried):
+            outputs[i] = out
+    return outputs, len(batches), len(retry)
+
+
+def summarize_articles(articles, max_concurrency=None, use_cache=None, mode=None):
     """
     Summarize list of article dicts.
     Each dict must contain 'title', 'description' or 'content'.
+
+    Articles are summarized concurrently through a bounded pool of at most
+    `max_concurrency` in-flight LLM calls (defaults to SUMMARIZER_MAX_CONCURRENCY).
+    Output keeps the input order.
+
+    Summaries already in the persistent cache (keyed by URL, title, content,
+    model and prompt version) are reused without calling the LLM.
+
+    mode="batched" (default SUMMARIZER_MODE) packs several articles into each
+    request, up to SUMMARIZER_BATCH_TOKEN_BUDGET estimated prompt tokens and
+    SUMMARIZER_BATCH_MAX_ARTICLES articles, and asks for JSON keyed by
+    article number; malformed slots are retried one article per request.
     """
-    summaries = []
+    if max_concurrency is None:
+        max_concurrency = SUMMARIZER_MAX_CONCURRENCY
+    if use_cache is None:
+        use_cache = SUMMARY_CACHE_ENABLED
+    mode = mode or SUMMARIZER_MODE
+    if mode not in ("single", "batched"):
+        raise ValueError(f"Unknown summarizer mode: {mode}")
 
+    pending = []
     for idx, article in enumerate(articles):
-        title = article.get("title", "Untitled")
-        content = article.get("description") or article.get("content") or ""
-        if not content:
+        inputs, key = summary_inputs(article)
+        if inputs is None:
             continue  # skip if no content to summarize
+        pending.append((idx, article, inputs, key))
+
+    cached = {}
+    if use_cache and pending:
+        cache = get_summary_cache()
+        cached = cache.get_many([key for *_, key in pending])
 
-        try:
-            chain = prompt_template | llm | output_parser
-            summary = chain.invoke({"title": title, "content": content})
-        except Exception as e:
-            summary = f"[Error summarizing article {idx+1}: {e}]"
+    misses = [item for item in pending if item[3] not in cached]
+    results = {}
+    if misses:
+        config = {"max_concurrency": max(1, max_concurrency)}
+        metrics = current_metrics()
+        if metrics is not None:
+            config["callbacks"] = [metrics.llm_callback("summarize")]
+        if mode == "batched" and len(misses) > 1:
+            outputs, requests, retried = _summarize_batched([inputs for _, _, inputs, _ in misses], config)
+            logger.info(f"Summarized {len(misses)} articles in {requests} batched requests "
+                        f"({retried} retried individually).")
+        else:
+            outputs = get_chain().batch(
+                [inputs for _, _, inputs, _ in misses],
+                config=config,
+                return_exceptions=True,
+            )
+        results = {item[0]: out for item, out in zip(misses, outputs)}
+        if use_cache:
+            cache.put_many(
+                (key, out.strip())
+                for (_, _, _, key), out in zip(misses, outputs)
+                if not isinstance(out, Exception)
+            )
+
+    summaries = []
+    for idx, article, inputs, key in pending:
+        summary = cached[key] if key in cached else results[idx]
+        if isinstance(summary, Exception):
+            summary = f"[Error summarizing article {idx+1}: {summary}]"
 
         summaries.append({
-            "title": title,
+            "title": inputs["title"],
             "summary": summary.strip(),
             "url": article.get("url"),
         })
@@ -1 +1,195 @@
 # Validates summaries for factual correctness
+# agents/validator_agent.py
+
+import re
+from functools import lru_cache
+from typing import Dict, List, Tuple
+import numpy as np
+from config.settings import (
+    SUMMARIZER_MAX_CONCURRENCY,
+    SUMMARY_CACHE_ENABLED,
+    VALIDATOR_MIN_SCORE,
+    VALIDATOR_RESUMMARIZE,
+)
+from agents.summarizer_agent import MODEL_NAME, get_summary_cache, summary_inputs
+from utils.api_utils import get_llm
+from utils.logger import setup_logger
+from utils.metrics import current_metrics
+
+logger = setup_logger("validator_agent")
+
+# Stricter, low-temperature prompt used only for summaries that failed the local checks
+GROUNDED_SUMMARY_PROMPT = """
+Summarize the following news article in about 2-3 sentences.
+Use ONLY facts stated in the article below. Do not add any numbers, names,
+dates or claims that do not appear in it.
+Keep the tone professional and informative.
+
+Title: {title}
+Content: {content}
+
+Return only the summary text.
+"""
+
+# A summary longer than this multiple of its source is padding or invention
+MAX_LENGTH_RATIO = 1.5
+MIN_SUMMARY_WORDS = 8
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)*")
+_STOPWORDS = frozenset(
+    "a an and are as at be been by for from has have in into is it its of on or that the their "
+    "this to was were will with which also its they than more about after over".split()
+)
+_ERROR_PREFIX = "[Error summarizing"
+
+
+@lru_cache(maxsize=None)
+def get_chain():
+    """Build the grounded re-summarization chain on first use."""
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_core.output_parsers import StrOutputParser
+
+    prompt_template = ChatPromptTemplate.from_template(GROUNDED_SUMMARY_PROMPT)
+    llm = get_llm(MODEL_NAME, temperature=0.2, max_tokens=256)
+    return prompt_template | llm | StrOutputParser()
+
+
+def _words(text: str) -> List[str]:
+    return [w for w in _TOKEN_RE.findall(text.lower()) if w not in _STOPWORDS]
+
+
+def _numbers(text: str) -> set:
+    return {n.replace(",", "").rstrip(".") for n in _NUMBER_RE.findall(text)}
+
+
+def _source_text(article: Dict) -> str:
+    return " ".join(
+        article.get(field) or "" for field in ("title", "description", "content")
+    )
+
+
+def score_summaries(summaries: List[Dict], articles: List[Dict]) -> List[Dict]:
+    """
+    Score each summary against its source article (matched by URL) with
+    cheap local checks:
+
+      - unigram / bigram precision: share of the summary's content words and
+        word pairs that also occur in the source
+      - unsupported numbers: numbers in the summary absent from the source
+      - length ratio: summary words / source words
+
+    Per-item features are counted in Python; the combined scores for the
+    whole batch are computed with NumPy. Returns one dict per summary with
+    "score" (0..1) and the individual features.
+    """
+    by_url = {a.get("url"): a for a in articles}
+    n = len(summaries)
+    unigram = np.zeros(n)
+    bigram = np.zeros(n)
+    unsupported = np.zeros(n)
+    ratio = np.zeros(n)
+    summary_words = np.zeros(n)
+    failed = np.zeros(n, dtype=bool)
+
+    for i, s in enumerate(summaries):
+        text = s.get("summary") or ""
+        article = by_url.get(s.get("url"))
+        if article is None or not text or text.startswith(_ERROR_PREFIX):
+            failed[i] = True
+            continue
+        source = _source_text(article)
+        words, source_words = _words(text), _words(source)
+        pairs = set(zip(words, words[1:]))
+        source_vocab = set(source_words)
+        if words:
+            unigram[i] = sum(w in source_vocab for w in words) / len(words)
+        if pairs:
+            bigram[i] = len(pairs & set(zip(source_words, source_words[1:]))) / len(pairs)
+        unsupported[i] = len(_numbers(text) - _numbers(source))
+        summary_words[i] = len(words)
+        ratio[i] = len(words) / max(1, len(source_words))
+
+    scores = 0.6 * unigram + 0.4 * bigram
+    scores -= 0.2 * np.minimum(unsupported, 3)
+    scores -= 0.3 * ((ratio > MAX_LENGTH_RATIO) | (summary_words < MIN_SUMMARY_WORDS))
+    scores = np.where(failed, 0.0, np.clip(scores, 0.0, 1.0))
+
+    return [
+        {
+            "url": s.get("url"),
+            "score": round(float(scores[i]), 3),
+            "unigram_overlap": round(float(unigram[i]), 3),
+            "bigram_overlap": round(float(bigram[i]), 3),
+            "unsupported_numbers": int(unsupported[i]),
+            "length_ratio": round(float(ratio[i]), 3),
+        }
+        for i, s in enumerate(summaries)
+    ]
+
+
+def validate_summaries(
+    summaries: List[Dict],
+    articles: List[Dict],
+    min_score: float = None,
+    resummarize: bool = None,
+) -> Tuple[List[Dict], Dict]:
+    """
+    Check every summary locally and re-summarize only the ones scoring
+    below `min_score` (default VALIDATOR_MIN_SCORE) with a grounded,
+    low-temperature prompt. A rewrite replaces the original only if it
+    scores higher, and is written back to the summary cache so the next run
+    doesn't repeat the fix.
+
+    Returns (summaries, report) where report counts checked, flagged,
+    resummarized and still_flagged items.
+    """
+    min_score = VALIDATOR_MIN_SCORE if min_score is None else min_score
+    resummarize = VALIDATOR_RESUMMARIZE if resummarize is None else resummarize
+
+    scores = score_summaries(summaries, articles)
+    flagged = [i for i, sc in enumerate(scores) if sc["score"] < min_score]
+    report = {"checked": len(summaries), "flagged": len(flagged), "resummarized": 0, "still_flagged": len(flagged)}
+    if not flagged or not resummarize:
+        if flagged:
+            logger.warning(f"{len(flagged)} summaries scored below {min_score}; re-summarizing disabled.")
+        return summaries, report
+
+    by_url = {a.get("url"): a for a in articles}
+    jobs = []
+    for i in flagged:
+        article = by_url.get(summaries[i].get("url"))
+        inputs, key = summary_inputs(article) if article is not None else (None, None)
+        if inputs is not None:
+            jobs.append((i, article, inputs, key))
+    if not jobs:
+        return summaries, report
+
+    logger.info(f"Re-summarizing {len(jobs)} of {len(summaries)} summaries that failed local checks.")
+    config = {"max_concurrency": max(1, SUMMARIZER_MAX_CONCURRENCY)}
+    metrics = current_metrics()
+    if metrics is not None:
+        config["callbacks"] = [metrics.llm_callback("validate")]
+    outputs = get_chain().batch([inputs for _, _, inputs, _ in jobs], config=config, return_exceptions=True)
+
+    candidates = [
+        (i, article, key, dict(summaries[i], summary=out.strip()))
+        for (i, article, _, key), out in zip(jobs, outputs)
+        if not isinstance(out, Exception) and out.strip()
+    ]
+    rescored = score_summaries([c[3] for c in candidates], [c[1] for c in candidates])
+
+    validated = list(summaries)
+    improved = []
+    for (i, _, key, candidate), new in zip(candidates, rescored):
+        if new["score"] > scores[i]["score"]:
+            validated[i] = candidate
+            scores[i] = new
+            improved.append((key, candidate["summary"]))
+
+    if improved and SUMMARY_CACHE_ENABLED:
+        get_summary_cache().put_many(improved)
+
+    report["resummarized"] = len(improved)
+    report["still_flagged"] = sum(scores[i]["score"] < min_score for i in flagged)
+    return validated, report
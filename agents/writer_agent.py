@@ -1,32 +1,27 @@
 # # Generates newsletter content in email format
 # # agents/writer_agent.py
 
-import os
 import json
-from datetime import datetime
+import html
+import os
+import tempfile
+import time
+from string import Template
+from functools import lru_cache
 from dotenv import load_dotenv
 from pathlib import Path
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
+from config.settings import ARCHIVE_ENABLED, WRITER_RENDER_MODE, WRITER_STREAM
+from agents.categorizer_agent import DEFAULT_SECTION, section_order
+from utils.api_utils import get_llm
+from utils.logger import setup_logger
+from utils.metrics import current_metrics
+from utils.newsletter_archive import get_newsletter_archive
 
 load_dotenv()
 
-# Get API details
-api_key = os.getenv("OPENROUTER_API_KEY")
-base_url = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+logger = setup_logger("writer_agent")
 
-if not api_key:
-    raise ValueError("OPENROUTER_API_KEY missing in .env")
-
-# Initialize LLM
-llm = ChatOpenAI(
-    model="meta-llama/llama-3-8b-instruct",
-    temperature=0.7,
-    max_tokens=2500,
-    api_key=api_key,
-    base_url=base_url,
-)
+MODEL_NAME = "meta-llama/llama-3-8b-instruct"
 
 # HTML newsletter template prompt
 # prompt_template = ChatPromptTemplate.from_template("""
@@ -45,7 +40,7 @@ llm = ChatOpenAI(
 # Return only the final HTML code.
 # """)
 
-prompt_template = ChatPromptTemplate.from_template("""
+NEWSLETTER_PROMPT = """
 You are an expert newsletter writer for an AI news digest.
 
 Write a professional and engaging newsletter in HTML format ONLY (no markdown, no **bold**, no markdown-style formatting).
@@ -61,6 +56,9 @@ IMPORTANT:
 - Never wrap text inside {{ }} unless part of HTML.
 - Only use clean HTML.
 
+If the articles have a "section" field, group them under one
+<h2 style="color:#ff9f1c;">SECTION_NAME</h2> heading per section, in the order given.
+
 For each article inside the JSON:
 - Use a <div> card.
 - Show <h2> for the title.
@@ -97,35 +95,247 @@ Return ONLY valid HTML. No markdown. No extraneous characters.
 
 Do not stop early. Generate the complete HTML until the final </html> tag.
 
-""")
+"""
+
+INTRO_PROMPT = """
+You are an expert newsletter writer for an AI news digest.
+
+Write a short introductory paragraph (2-4 sentences) about today's AI news,
+based on the article titles below. Keep the tone professional and engaging.
 
+Return ONLY the paragraph text. No HTML, no markdown, no greeting or sign-off.
 
+ARTICLE TITLES:
+{titles}
+"""
 
 
-output_parser = StrOutputParser()
+@lru_cache(maxsize=None)
+def get_chain(mode="llm"):
+    """
+    Build the writer chain on first use.
+
+    "llm" writes the full HTML (max_tokens=2500); "template" writes only the
+    intro paragraph with a short-output LLM (max_tokens=200).
+    """
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_core.output_parsers import StrOutputParser
+
+    if mode == "template":
+        prompt_template = ChatPromptTemplate.from_template(INTRO_PROMPT)
+        llm = get_llm(MODEL_NAME, temperature=0.7, max_tokens=200)
+    else:
+        prompt_template = ChatPromptTemplate.from_template(NEWSLETTER_PROMPT)
+        llm = get_llm(MODEL_NAME, temperature=0.7, max_tokens=2500)
+    return prompt_template | llm | StrOutputParser()
+
+# Precompiled skeleton for the template render mode; mirrors the LLM prompt above
+NEWSLETTER_TEMPLATE = Template("""<html>
+  <body style="background-color:#0e1117; color:white; font-family:Arial; padding:25px;">
+    <h1 style="text-align:center; color:#61dafb;">AI Newsletter Digest</h1>
+
+    <p style="font-size:16px; opacity:0.9;">
+      $intro
+    </p>
+$cards
+    <p style="margin-top:40px;">Stay tuned for more AI insights!</p>
+  </body>
+</html>
+""")
+
+CARD_TEMPLATE = Template("""
+    <div style="background-color:#1a1f25; padding:20px; border-radius:10px; margin-bottom:25px;">
+      <h2 style="color:#61dafb;">$title</h2>
+      <p>$summary</p>
+      <a href="$url" style="color:#ff9f1c;">Read full article</a>
+    </div>
+""")
+
+SECTION_TEMPLATE = Template("""
+    <h2 style="color:#ff9f1c; border-bottom:1px solid #2a313a; padding-bottom:8px; margin-top:35px;">$section</h2>
+""")
 
 CACHE_DIR = Path("data/cache")
 CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
-def generate_newsletter(summaries):
-    """Takes list of {title, summary, url} dicts and returns HTML newsletter string."""
+LATEST_PATH = CACHE_DIR / "newsletter.html"
+# In-progress output is streamed to newsletter.<random>.partial.html next to it
+PARTIAL_SUFFIX = ".partial.html"
+PARTIAL_FLUSH_SECONDS = 0.2
+STALE_PARTIAL_SECONDS = 3600
+
+
+def latest_partial():
+    """Path of the most recently updated in-progress newsletter, or None."""
+    latest, latest_mtime = None, None
+    for path in CACHE_DIR.glob(f"newsletter.*{PARTIAL_SUFFIX}"):
+        try:
+            mtime = path.stat().st_mtime
+        except FileNotFoundError:
+            continue  # published (renamed) meanwhile
+        if latest_mtime is None or mtime > latest_mtime:
+            latest, latest_mtime = path, mtime
+    return latest
+
+
+def _remove_stale_partials():
+    # Left behind by runs that were killed mid-stream
+    cutoff = time.time() - STALE_PARTIAL_SECONDS
+    for path in CACHE_DIR.glob(f"newsletter.*{PARTIAL_SUFFIX}"):
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _open_partial():
+    fd, path = tempfile.mkstemp(dir=CACHE_DIR, prefix="newsletter.", suffix=PARTIAL_SUFFIX)
+    # mkstemp creates 0600 and os.replace keeps it; the app may run as another user
+    if hasattr(os, "fchmod"):
+        os.fchmod(fd, 0o644)
+    return os.fdopen(fd, "w", encoding="utf-8"), Path(path)
+
+
+def _publish(newsletter_html, partial_path=None):
+    """Atomically replace newsletter.html, so readers never see a half-written file."""
+    if partial_path is None:
+        f, partial_path = _open_partial()
+        with f:
+            f.write(newsletter_html)
+    os.replace(partial_path, LATEST_PATH)
+
+
+def _stream_to_partial(chain, inputs, config, on_chunk=None):
+    """
+    Consume the chain's token stream into a partial file, flushing every
+    PARTIAL_FLUSH_SECONDS so previews can follow along. Returns (html, path).
+    """
+    f, partial_path = _open_partial()
+    parts = []
     try:
-        articles_json = json.dumps(summaries, ensure_ascii=False, indent=2)
-        chain = prompt_template | llm | output_parser
-        newsletter_html = chain.invoke({"articles_json": articles_json})
+        with f:
+            last_flush = time.monotonic()
+            for chunk in chain.stream(inputs, config=config):
+                parts.append(chunk)
+                f.write(chunk)
+                if on_chunk is not None:
+                    on_chunk(chunk)
+                now = time.monotonic()
+                if now - last_flush >= PARTIAL_FLUSH_SECONDS:
+                    f.flush()
+                    last_flush = now
+    except BaseException:
+        partial_path.unlink(missing_ok=True)
+        raise
+    return "".join(parts), partial_path
+
+
+def group_by_section(summaries, categories):
+    """[(section, summaries)] in section display order; uncategorized go to DEFAULT_SECTION."""
+    groups = {}
+    for s in summaries:
+        groups.setdefault(categories.get(s.get("url"), DEFAULT_SECTION), []).append(s)
+    order = section_order()
+    return sorted(groups.items(), key=lambda item: order.index(item[0]) if item[0] in order else len(order))
+
+
+def _render_cards(summaries):
+    return "".join(
+        CARD_TEMPLATE.substitute(
+            title=html.escape(s.get("title") or "Untitled"),
+            summary=html.escape(s.get("summary") or ""),
+            url=html.escape(s.get("url") or "#", quote=True),
+        )
+        for s in summaries
+    )
+
+
+def render_newsletter(summaries, intro, categories=None):
+    """
+    Fill the precompiled HTML template locally from the summaries list.
+    With categories ({url: section}) the cards are grouped under section headings.
+    """
+    if categories:
+        cards = "".join(
+            SECTION_TEMPLATE.substitute(section=html.escape(section)) + _render_cards(items)
+            for section, items in group_by_section(summaries, categories)
+        )
+    else:
+        cards = _render_cards(summaries)
+    return NEWSLETTER_TEMPLATE.substitute(intro=html.escape(intro.strip()), cards=cards)
+
+
+def generate_newsletter(summaries, mode=None, categories=None, stream=None, on_chunk=None,
+                        topic=None, run_id=None, archive=None):
+    """
+    Takes list of {title, summary, url} dicts and returns HTML newsletter string.
+
+    mode="llm" asks the model to write the whole HTML document. mode="template"
+    only asks it for the intro paragraph and renders the cards locally, so
+    output tokens no longer grow with the number of articles.
+    Defaults to WRITER_RENDER_MODE.
+
+    categories ({url: section}, from categorizer_agent) groups the articles
+    into sections: rendered locally in template mode, or passed to the model
+    as a "section" field on each article in llm mode.
+
+    With stream=True (default WRITER_STREAM) llm mode consumes the model's
+    token stream into a partial file (see latest_partial()), calling
+    on_chunk(text) per chunk, and renames it over newsletter.html once
+    complete. newsletter.html is always replaced atomically.
+
+    Unless archive=False (default ARCHIVE_ENABLED), the issue and its
+    summaries are also stored gzip-compressed in the newsletter archive,
+    indexed with `topic` and `run_id`.
+    """
+    mode = mode or WRITER_RENDER_MODE
+    stream = WRITER_STREAM if stream is None else stream
+    if mode not in ("llm", "template"):
+        raise ValueError(f"Unknown newsletter render mode: {mode}")
+
+    metrics = current_metrics()
+    config = {"callbacks": [metrics.llm_callback("write")]} if metrics is not None else None
+
+    _remove_stale_partials()
+    partial_path = None
+    try:
+        if mode == "template":
+            titles = "\n".join(f"- {s.get('title')}" for s in summaries)
+            chain = get_chain("template")
+            intro = chain.invoke({"titles": titles}, config=config)
+            newsletter_html = render_newsletter(summaries, intro, categories)
+        else:
+            articles = summaries
+            if categories:
+                articles = [
+                    dict(s, section=section)
+                    for section, items in group_by_section(summaries, categories)
+                    for s in items
+                ]
+            articles_json = json.dumps(articles, ensure_ascii=False, indent=2)
+            chain = get_chain("llm")
+            if stream:
+                newsletter_html, partial_path = _stream_to_partial(
+                    chain, {"articles_json": articles_json}, config, on_chunk
+                )
+            else:
+                newsletter_html = chain.invoke({"articles_json": articles_json}, config=config)
     except Exception as e:
         raise RuntimeError(f"Newsletter generation failed: {e}")
 
-    # Save HTML to cache
-    #output_path = CACHE_DIR / "newsletter.html"
-    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    output_path = CACHE_DIR / f"newsletter_{timestamp}.html"
-
-    # Also update the latest pointer
-    latest_path = CACHE_DIR / "newsletter.html"
-    with open(latest_path, "w", encoding="utf-8") as f:
-        f.write(newsletter_html)
-
+    # Update the latest pointer first; the archive is optional and must not block delivery
+    _publish(newsletter_html, partial_path)
+
+    # Keep every issue in the compressed archive
+    if ARCHIVE_ENABLED if archive is None else archive:
+        archived = [dict(s, section=categories.get(s.get("url"))) for s in summaries] if categories else summaries
+        try:
+            entry = get_newsletter_archive().add(newsletter_html, archived, topic=topic, run_id=run_id)
+        except OSError as e:
+            logger.warning(f"Could not archive newsletter issue: {e}")
+        else:
+            logger.info(f"Archived issue {entry['id']} ({entry['html_bytes']} -> {entry['stored_bytes']} bytes)")
 
     return newsletter_html
 
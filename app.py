@@ -1,16 +1,17 @@
 import streamlit as st
-import json
 from pathlib import Path
 from datetime import datetime
-from langgraph_workflow.graph_definition import run_newsletter_workflow
+from agents.writer_agent import latest_partial
+from langgraph_workflow.runner import get_workflow_runner
+from utils.db_utils import get_subscriber_store
 from utils.logger import setup_logger
+from utils.newsletter_archive import get_newsletter_archive
 
 # Setup
 st.set_page_config(page_title="AI Newsletter Assistant", layout="wide")
 logger = setup_logger("ui_app")
 
 DATA_DIR = Path("data")
-SUBSCRIBERS_FILE = DATA_DIR / "subscribers.json"
 NEWSLETTER_FILE = DATA_DIR / "cache/newsletter.html"
 SETTINGS_FILE = Path("config/settings.py")
 
@@ -230,12 +231,34 @@ def inject_custom_css():
 inject_custom_css()
 
 # --- Helper Functions ---
+# Streamlit re-executes this script on every interaction. File-backed data is
+# cached with st.cache_data keyed on the file's (mtime, size), so a rerun only
+# stats the files and reads them again after they actually changed.
+
+def file_signature(*paths):
+    """(mtime_ns, size) of each path, None for missing files."""
+    signature = []
+    for path in paths:
+        try:
+            stat = Path(path).stat()
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            signature.append(None)
+    return tuple(signature)
+
+@st.cache_data(max_entries=4)
+def _subscriber_count(signature):
+    return get_subscriber_store().count()
+
 def get_subscriber_count():
-    if SUBSCRIBERS_FILE.exists():
-        with open(SUBSCRIBERS_FILE, "r", encoding="utf-8") as f:
-            subscribers = json.load(f)
-        return len(subscribers)
-    return 0
+    # SQLite in WAL mode writes to the -wal file first, so watch both
+    db_path = get_subscriber_store().db_path
+    return _subscriber_count(file_signature(db_path, f"{db_path}-wal"))
+
+@st.cache_resource
+def workflow_runner():
+    # One runner per server process, shared by every session
+    return get_workflow_runner()
 
 def get_last_newsletter_time():
     if NEWSLETTER_FILE.exists():
@@ -243,11 +266,41 @@ def get_last_newsletter_time():
         return modified_time.strftime("%Y-%m-%d %H:%M:%S")
     return "No newsletter generated yet."
 
+@st.cache_data(max_entries=4)
+def _newsletter_html(signature):
+    return NEWSLETTER_FILE.read_text(encoding="utf-8")
+
 def load_newsletter_preview():
-    if NEWSLETTER_FILE.exists():
-        return NEWSLETTER_FILE.read_text(encoding="utf-8")
+    signature = file_signature(NEWSLETTER_FILE)
+    if signature[0] is not None:
+        return _newsletter_html(signature)
     return "<p>No newsletter available yet. Please generate one.</p>"
 
+@st.cache_data(max_entries=16)
+def _archive_index(signature, query):
+    return get_newsletter_archive().entries(query=query)
+
+def load_archive_index(query=""):
+    # Only index.jsonl is read here; issues are decompressed when previewed
+    return _archive_index(file_signature(get_newsletter_archive().index_path), query)
+
+@st.cache_data(max_entries=16)
+def load_archived_html(issue_id):
+    # Archived issues never change, so the id alone is a safe cache key
+    return get_newsletter_archive().load_html(issue_id)
+
+@st.cache_data(max_entries=4)
+def _current_topic(signature):
+    topic = "Artificial Intelligence"
+    if signature[0] is not None:
+        for line in SETTINGS_FILE.read_text(encoding="utf-8").splitlines():
+            if line.strip().startswith("TOPIC"):
+                topic = line.split("=")[1].strip().replace("'", "")
+    return topic
+
+def get_current_topic():
+    return _current_topic(file_signature(SETTINGS_FILE))
+
 def update_topic(new_topic):
     settings_path = Path("config/settings.py")
     with open(settings_path, "r", encoding="utf-8") as f:
@@ -269,7 +322,7 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # --- TABS ---
-tabs = st.tabs(["🏠 Dashboard", "📰 Newsletter Preview", "📤 Generate & Send", "⚙️ Configuration"])
+tabs = st.tabs(["🏠 Dashboard", "📰 Newsletter Preview", "🗄️ Archive", "📤 Generate & Send", "⚙️ Configuration"])
 
 # 🏠 HOME OVERVIEW
 with tabs[0]:
@@ -344,18 +397,73 @@ with tabs[0]:
 with tabs[1]:
     st.subheader("📰 Latest Newsletter Preview")
 
-    html_content = load_newsletter_preview()
+    @st.fragment(run_every=2)
+    def show_preview():
+        # While a run is writing, show the newsletter as it streams in
+        html_content = None
+        partial = latest_partial() if workflow_runner().is_running() else None
+        if partial is not None:
+            try:
+                html_content = partial.read_text(encoding="utf-8", errors="replace")
+                st.caption("✍️ Generating newsletter... showing partial output")
+            except FileNotFoundError:
+                pass  # just published as newsletter.html
+        if html_content is None:
+            html_content = load_newsletter_preview()
+
+        styled_html = f"""
+        <div class="preview-box">
+            {html_content}
+        </div>
+        """
 
-    styled_html = f"""
-    <div class="preview-box">
-        {html_content}
-    </div>
-    """
+        st.components.v1.html(styled_html, height=650, scrolling=True)
 
-    st.components.v1.html(styled_html, height=650, scrolling=True)
+    show_preview()
 
-# 📤 SEND NOW
+# 🗄️ ARCHIVE
 with tabs[2]:
+    st.markdown("### 🗄️ Newsletter Archive")
+
+    archive = get_newsletter_archive()
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        archive_query = st.text_input("Search archive", placeholder="Search by topic or article title...", label_visibility="collapsed")
+    entries = load_archive_index(archive_query)
+    topics = sorted({e["topic"] for e in entries if e.get("topic")})
+    with col2:
+        archive_topic = st.selectbox("Topic", ["All topics"] + topics, label_visibility="collapsed")
+    if archive_topic != "All topics":
+        entries = [e for e in entries if e.get("topic") == archive_topic]
+
+    if not entries:
+        st.info("No archived newsletters yet." if not archive_query else "No issues match your search.")
+    else:
+        st.caption(f"{len(entries)} issues • {sum(e['stored_bytes'] for e in entries) / 1024:.1f} KB on disk")
+        st.dataframe(
+            [
+                {
+                    "Date": e["created_at"].replace("T", " "),
+                    "Topic": e.get("topic") or "",
+                    "Articles": e["articles"],
+                    "Size (KB)": round(e["html_bytes"] / 1024, 1),
+                    "Stored (KB)": round(e["stored_bytes"] / 1024, 1),
+                }
+                for e in entries
+            ],
+            use_container_width=True,
+            hide_index=True,
+        )
+        labels = {e["id"]: f"{e['created_at'].replace('T', ' ')} • {e.get('topic') or ''} ({e['articles']} articles)" for e in entries}
+        selected = st.selectbox("Preview issue", list(labels), format_func=labels.get)
+        st.components.v1.html(
+            f"""<div class="preview-box">{load_archived_html(selected)}</div>""",
+            height=650,
+            scrolling=True,
+        )
+
+# 📤 SEND NOW
+with tabs[3]:
     st.markdown("### ⚡ Generate & Send Newsletter")
     
     st.markdown("""
@@ -376,21 +484,60 @@ with tabs[2]:
     
     st.markdown("<br>", unsafe_allow_html=True)
 
+    runner = workflow_runner()
+
     col1, col2, col3 = st.columns([1, 2, 1])
     with col2:
-        if st.button("🚀 Generate Newsletter Now", use_container_width=True):
-            with st.spinner("⏳ Running newsletter pipeline..."):
-                try:
-                    result = run_newsletter_workflow()
-                    st.success("🎉 Newsletter generated & sent successfully!")
-                    st.json(result)
-                    logger.info("Manual trigger executed successfully from UI.")
-                except Exception as e:
-                    st.error(f"❌ Workflow failed: {e}")
-                    logger.error(f"Manual trigger failed: {e}")
+        if st.button("🚀 Generate Newsletter Now", use_container_width=True, disabled=runner.is_running()):
+            started, _ = runner.submit()
+            if started:
+                logger.info("Manual trigger submitted from UI.")
+            else:
+                st.warning("⏳ A newsletter run is already in progress.")
+
+    PIPELINE_STAGES = ["fetch", "dedup", "summarize", "validate", "categorize", "write", "check_mail", "mail"]
+    STAGE_ICONS = {"running": "⏳", "ok": "✅", "failed": "❌", "restored": "↩️"}
+
+    @st.fragment(run_every=2)
+    def show_run_progress():
+        status = runner.status()
+        state = status["state"]
+        if state == "idle":
+            return
+
+        run_label = status.get("run_id") or "starting..."
+        if state in ("starting", "running"):
+            st.info(f"⏳ Running newsletter pipeline • run `{run_label}`")
+        elif state == "succeeded":
+            st.success(f"🎉 Newsletter generated & sent successfully! • run `{run_label}`")
+        else:
+            st.error(f"❌ Workflow failed: {status.get('error')}")
+
+        stages = status.get("progress", {}).get("stages", {})
+        for name in PIPELINE_STAGES:
+            info = stages.get(name)
+            if info is None:
+                st.markdown(f"⚪ **{name}** — {'not reached' if state == 'failed' else 'waiting'}")
+                continue
+            counts = ", ".join(f"{k}: {v}" for k, v in info["items"].items())
+            timing = f" ({info['wall_seconds']:.1f}s)" if "wall_seconds" in info else ""
+            if info["status"] == "restored":
+                timing += " from an earlier attempt"
+            st.markdown(f"{STAGE_ICONS.get(info['status'], '⚪')} **{name}**{timing} {counts}")
+
+        if state in ("starting", "running"):
+            smtp = status.get("progress", {}).get("smtp", {})
+            sends = smtp.get("latency", {}).get("count", 0)
+            if sends:
+                st.caption(f"📧 {sends} SMTP sends so far, {smtp.get('failures', 0)} failed")
+        elif state == "succeeded":
+            with st.expander("Run result"):
+                st.json(status["result"])
+
+    show_run_progress()
 
 # 🧠 SETTINGS TAB
-with tabs[3]:
+with tabs[4]:
     st.markdown("### ⚙️ Configuration Settings")
 
     st.markdown("""
@@ -405,13 +552,7 @@ with tabs[3]:
     
     st.markdown("<br>", unsafe_allow_html=True)
 
-    current_topic = "Artificial Intelligence"
-    settings_path = Path("config/settings.py")
-
-    if settings_path.exists():
-        for line in settings_path.read_text(encoding="utf-8").splitlines():
-            if line.strip().startswith("TOPIC"):
-                current_topic = line.split("=")[1].strip().replace("'", "")
+    current_topic = get_current_topic()
 
     col1, col2 = st.columns([3, 1])
     with col1:
@@ -0,0 +1,261 @@
+# Local stand-ins for NewsAPI, the OpenRouter chat API and an SMTP server
+# benchmarks/fakes.py
+
+import json
+import re
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+class _QuietHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _BackgroundServer:
+    """Runs a socketserver on 127.0.0.1 with an OS-assigned port in a daemon thread."""
+
+    server_class = None
+    handler_class = None
+
+    def __init__(self):
+        self.server = self.server_class(("127.0.0.1", 0), self.handler_class)
+        self.server.owner = self
+        self.port = self.server.server_address[1]
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class _ThreadingHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+
+# --- NewsAPI ---
+
+class _NewsAPIHandler(_QuietHandler):
+    def do_GET(self):
+        owner = self.server.owner
+        params = parse_qs(urlparse(self.path).query)
+        query = params.get("q", [""])[0]
+        page = int(params.get("page", ["1"])[0])
+        page_size = int(params.get("pageSize", ["10"])[0])
+        if owner.latency:
+            time.sleep(owner.latency)
+
+        start = (page - 1) * page_size
+        stop = min(start + page_size, owner.total_results)
+        articles = [
+            {
+                "source": {"id": None, "name": f"Source {i % 17}"},
+                "title": f"{query} story {i}: model release and funding update",
+                "description": f"Synthetic description for story {i} about {query} research, startups and policy.",
+                "url": f"https://news.example.com/{i}",
+                "publishedAt": "2024-01-01T00:00:00Z",
+                "content": f"Synthetic article body {i}. " * 8,
+            }
+            for i in range(start, stop)
+        ]
+        self._send_json({"status": "ok", "totalResults": owner.total_results, "articles": articles})
+
+
+class FakeNewsAPIServer(_BackgroundServer):
+    """Serves /v2/everything with `total_results` synthetic, uniquely-URLed articles."""
+
+    server_class = _ThreadingHTTPServer
+    handler_class = _NewsAPIHandler
+
+    def __init__(self, total_results=100, latency=0.0):
+        self.total_results = total_results
+        self.latency = latency
+        super().__init__()
+
+    @property
+    def endpoint(self):
+        return f"http://127.0.0.1:{self.port}/v2/everything"
+
+
+# --- OpenAI-compatible chat completions ---
+
+class _ChatHandler(_QuietHandler):
+    CHUNK_CHARS = 16
+
+    def do_POST(self):
+        owner = self.server.owner
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        prompt = "\n".join(str(m.get("content", "")) for m in body.get("messages", []))
+        if owner.latency:
+            time.sleep(owner.latency)
+        with owner.lock:
+            owner.calls += 1
+
+        text = owner.reply_for(prompt)
+        usage = {
+            "prompt_tokens": len(prompt) // 4,
+            "completion_tokens": len(text) // 4,
+            "total_tokens": (len(prompt) + len(text)) // 4,
+        }
+        if body.get("stream"):
+            self._send_stream(body, text, usage)
+            return
+        self._send_json({
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": "stop",
+            }],
+            "usage": usage,
+        })
+
+    def _send_stream(self, body, text, usage):
+        """Server-sent events in OpenAI chunk format, CHUNK_CHARS characters per event."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def event(choices, **extra):
+            payload = {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model", "fake"),
+                "choices": choices,
+                **extra,
+            }
+            self._write_chunk(f"data: {json.dumps(payload)}\n\n")
+
+        for start in range(0, len(text), self.CHUNK_CHARS):
+            piece = text[start:start + self.CHUNK_CHARS]
+            event([{"index": 0, "delta": {"content": piece}, "finish_reason": None}])
+        event([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        if (body.get("stream_options") or {}).get("include_usage"):
+            event([], usage=usage)
+        self._write_chunk("data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, data):
+        data = data.encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+
+
+class FakeChatServer(_BackgroundServer):
+    """
+    Minimal OpenAI-compatible /chat/completions endpoint with a fixed per-call
+    latency, answering plain or streamed ("stream": true) requests. Point
+    OPENROUTER_BASE_URL at `base_url` to use it.
+    """
+
+    server_class = _ThreadingHTTPServer
+    handler_class = _ChatHandler
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+        self.lock = threading.Lock()
+        super().__init__()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.port}/v1"
+
+    def reply_for(self, prompt):
+        if "maps each article's number" in prompt:
+            count = len(re.findall(r"^ARTICLE \d+$", prompt, re.MULTILINE))
+            return json.dumps({
+                str(n): f"This is synthetic summary {n}. It exists for benchmarking." for n in range(count)
+            })
+        if "ARTICLES JSON" in prompt:
+            return (
+                "<html><body><h1>AI Newsletter Digest</h1><p>Fake digest.</p>"
+                "<p>Stay tuned for more AI insights!</p></body></html>"
+            )
+        if "introductory paragraph" in prompt:
+            return "Here is a synthetic introduction to today's AI news."
+        return "This is a synthetic two-sentence summary. It exists for benchmarking."
+
+
+# --- SMTP ---
+
+class _SMTPSinkHandler(socketserver.StreamRequestHandler):
+    def _reply(self, line):
+        self.wfile.write(line.encode("ascii") + b"\r\n")
+
+    def handle(self):
+        owner = self.server.owner
+        self._reply("220 localhost fake SMTP sink")
+        in_data = False
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            if in_data:
+                if line in (b".\r\n", b".\n"):
+                    in_data = False
+                    if owner.latency:
+                        time.sleep(owner.latency)
+                    with owner.lock:
+                        owner.messages += 1
+                    self._reply("250 OK queued")
+                continue
+            verb = line[:4].upper()
+            if verb in (b"EHLO", b"HELO"):
+                self._reply("250 localhost")
+            elif verb == b"DATA":
+                in_data = True
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+            elif verb == b"QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                # MAIL, RCPT, RSET, NOOP
+                self._reply("250 OK")
+
+
+class _ThreadingTCPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+    request_queue_size = 256
+
+
+class SMTPSink(_BackgroundServer):
+    """Accepts and discards mail over plain SMTP (no STARTTLS/AUTH), counting messages."""
+
+    server_class = _ThreadingTCPServer
+    handler_class = _SMTPSinkHandler
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.messages = 0
+        self.lock = threading.Lock()
+        super().__init__()
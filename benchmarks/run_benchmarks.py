@@ -0,0 +1,221 @@
+# Offline throughput benchmarks for the newsletter pipeline
+# benchmarks/run_benchmarks.py
+#
+# Runs run_fetcher, summarize_articles, generate_newsletter and run_mailer
+# against local fakes (benchmarks/fakes.py) - no network access or API keys
+# needed - and reports items/sec and p50/p95 per-item latency.
+#
+#   python -m benchmarks.run_benchmarks
+#   python -m benchmarks.run_benchmarks --sizes 10,1000 --stages summarize,mail --llm-latency 0.05
+
+import argparse
+import json
+import math
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from benchmarks.fakes import FakeChatServer, FakeNewsAPIServer, SMTPSink
+
+STAGES = ("fetch", "summarize", "write", "mail")
+
+
+def _configure_env(news, chat, smtp):
+    """Point every agent at the local fakes; must run before agents are imported."""
+    os.environ.update({
+        "NEWS_API_KEY": "benchmark",
+        "NEWSAPI_ENDPOINT": news.endpoint,
+        "NEWSAPI_CACHE_TTL_SECONDS": "0",
+        "OPENROUTER_API_KEY": "benchmark",
+        "OPENROUTER_BASE_URL": chat.base_url,
+        "SUMMARY_CACHE_ENABLED": "false",
+        "SMTP_HOST": "127.0.0.1",
+        "SMTP_PORT": str(smtp.port),
+        "SMTP_STARTTLS": "false",
+        "SMTP_AUTH": "false",
+        "EMAIL_USER": "bench@example.com",
+        "MAILER_RATE_LIMIT": "0",
+    })
+
+
+def _articles(n):
+    return [
+        {
+            "title": f"Synthetic story {i}",
+            "description": f"Synthetic description {i} about AI research, startups and policy.",
+            "url": f"https://news.example.com/{i}",
+            "source": "Bench",
+            "publishedAt": "2024-01-01T00:00:00Z",
+            "content": f"Synthetic article body {i}. " * 8,
+        }
+        for i in range(n)
+    ]
+
+
+def _summaries(n):
+    return [
+        {
+            "title": f"Synthetic story {i}",
+            "summary": "This is a synthetic two-sentence summary. It exists for benchmarking.",
+            "url": f"https://news.example.com/{i}",
+        }
+        for i in range(n)
+    ]
+
+
+def bench_fetch(n, servers, args):
+    from agents.fetcher_agent import run_fetcher
+
+    servers["news"].total_results = n
+    page_size = min(100, n)
+    pages = math.ceil(n / page_size)
+    return lambda: len(run_fetcher("benchmark", page_size=page_size, pages=pages, use_cache=False))
+
+
+def bench_summarize(n, servers, args):
+    from agents.summarizer_agent import summarize_articles
+
+    articles = _articles(n)
+    return lambda: len(summarize_articles(
+        articles, max_concurrency=args.max_concurrency, use_cache=False, mode=args.summarizer_mode
+    ))
+
+
+def bench_write(n, servers, args):
+    from agents.writer_agent import generate_newsletter
+
+    summaries = _summaries(n)
+    return lambda: (generate_newsletter(summaries, mode=args.writer_mode, stream=args.writer_stream), n)[1]
+
+
+def bench_mail(n, servers, args):
+    from agents import mailer_agent
+    from utils.db_utils import get_subscriber_store
+
+    store = get_subscriber_store()
+    store.clear()
+    store.add_many((f"reader{i}@example.com", f"Reader {i}") for i in range(n))
+    mailer_agent.NEWSLETTER_PATH.parent.mkdir(parents=True, exist_ok=True)
+    mailer_agent.NEWSLETTER_PATH.write_text(
+        "<html><body>" + "<p>Benchmark newsletter body.</p>" * 200
+        + "<p>Stay tuned for more AI insights!</p></body></html>",
+        encoding="utf-8",
+    )
+    # A fresh newsletter ID per run, so the delivery log doesn't skip recipients
+    return lambda: mailer_agent.run_mailer(
+        newsletter_id=f"bench-{n}-{time.time_ns()}", shards=args.mailer_shards
+    )["sent"]
+
+
+BENCHES = {
+    "fetch": bench_fetch,
+    "summarize": bench_summarize,
+    "write": bench_write,
+    "mail": bench_mail,
+}
+
+
+def _latency_histogram(run, stage):
+    if stage == "fetch":
+        return run.http_latency
+    if stage == "mail":
+        return run.smtp_latency
+    return run.llm_latency.get("summarize" if stage == "summarize" else "write")
+
+
+def run_benchmark(stage, n, servers, args):
+    from utils.metrics import RunMetrics
+
+    action = BENCHES[stage](n, servers, args)
+    run = RunMetrics(f"bench-{stage}-{n}")
+    started = time.perf_counter()
+    with run.stage(stage) as items:
+        items["items"] = action()
+    elapsed = time.perf_counter() - started
+
+    hist = _latency_histogram(run, stage)
+    return {
+        "stage": stage,
+        "size": n,
+        "items": items["items"],
+        "seconds": round(elapsed, 4),
+        "items_per_sec": round(items["items"] / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(hist.percentile(0.50) * 1000, 3) if hist else None,
+        "p95_ms": round(hist.percentile(0.95) * 1000, 3) if hist else None,
+    }
+
+
+def _print_table(results):
+    header = f"{'stage':<10} {'size':>8} {'items':>8} {'seconds':>10} {'items/sec':>12} {'p50 ms':>10} {'p95 ms':>10}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        p50 = "-" if r["p50_ms"] is None else f"{r['p50_ms']:.3f}"
+        p95 = "-" if r["p95_ms"] is None else f"{r['p95_ms']:.3f}"
+        print(f"{r['stage']:<10} {r['size']:>8} {r['items']:>8} {r['seconds']:>10.3f} "
+              f"{r['items_per_sec']:>12.2f} {p50:>10} {p95:>10}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline newsletter pipeline benchmarks")
+    parser.add_argument("--sizes", default="10,1000,100000",
+                        help="Comma-separated article/subscriber counts (default: 10,1000,100000)")
+    parser.add_argument("--stages", default=",".join(STAGES),
+                        help=f"Comma-separated stages to run (default: {','.join(STAGES)})")
+    parser.add_argument("--llm-latency", type=float, default=0.005, help="Fake LLM seconds per call")
+    parser.add_argument("--newsapi-latency", type=float, default=0.0, help="Fake NewsAPI seconds per page")
+    parser.add_argument("--smtp-latency", type=float, default=0.0, help="Fake SMTP seconds per message")
+    parser.add_argument("--max-concurrency", type=int, default=None, help="Summarizer concurrency")
+    parser.add_argument("--summarizer-mode", default="single", choices=("single", "batched"))
+    parser.add_argument("--mailer-shards", type=int, default=1, help="Mailer sender processes")
+    parser.add_argument("--writer-mode", default="template", choices=("llm", "template"))
+    parser.add_argument("--writer-stream", action="store_true", help="Stream llm-mode writer output")
+    parser.add_argument("--json", dest="json_path", help="Also write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = set(stages) - set(BENCHES)
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(sorted(unknown))}")
+    json_path = Path(args.json_path).resolve() if args.json_path else None
+
+    # Agents use relative data/ paths; keep benchmark files out of the real tree
+    workdir = tempfile.mkdtemp(prefix="newsletter-bench-")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+
+    servers = {
+        "news": FakeNewsAPIServer(latency=args.newsapi_latency).start(),
+        "chat": FakeChatServer(latency=args.llm_latency).start(),
+        "smtp": SMTPSink(latency=args.smtp_latency).start(),
+    }
+    _configure_env(servers["news"], servers["chat"], servers["smtp"])
+
+    results = []
+    try:
+        for n in sizes:
+            for stage in stages:
+                print(f"Running {stage} x {n}...", file=sys.stderr)
+                results.append(run_benchmark(stage, n, servers, args))
+    finally:
+        for server in servers.values():
+            server.stop()
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    _print_table(results)
+    if json_path:
+        json_path.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -7,3 +7,74 @@ NEWS_API_KEY = os.getenv('NEWS_API_KEY')
 EMAIL_USER = os.getenv('EMAIL_USER')
 EMAIL_PASS = os.getenv('EMAIL_PASS')
 TOPIC = 'Artificial Intelligence'
+
+# Logging
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')  # 'text' or 'json' (JSON lines with run_id and stage)
+LOG_RETENTION_DAYS = int(os.getenv('LOG_RETENTION_DAYS', '30'))
+
+# Summarizer
+SUMMARIZER_MAX_CONCURRENCY = int(os.getenv('SUMMARIZER_MAX_CONCURRENCY', '8'))
+SUMMARY_CACHE_ENABLED = os.getenv('SUMMARY_CACHE_ENABLED', 'true').lower() == 'true'
+SUMMARY_CACHE_TTL_SECONDS = int(os.getenv('SUMMARY_CACHE_TTL_SECONDS', str(7 * 24 * 3600)))
+SUMMARY_CACHE_MAX_ENTRIES = int(os.getenv('SUMMARY_CACHE_MAX_ENTRIES', '5000'))
+# 'single' = one request per article; 'batched' = several articles per request, packed by token budget
+SUMMARIZER_MODE = os.getenv('SUMMARIZER_MODE', 'single')
+SUMMARIZER_BATCH_TOKEN_BUDGET = int(os.getenv('SUMMARIZER_BATCH_TOKEN_BUDGET', '3000'))
+SUMMARIZER_BATCH_MAX_ARTICLES = int(os.getenv('SUMMARIZER_BATCH_MAX_ARTICLES', '8'))
+
+# Mailer
+SMTP_HOST = os.getenv('SMTP_HOST', 'smtp.gmail.com')
+SMTP_PORT = int(os.getenv('SMTP_PORT', '587'))
+SMTP_STARTTLS = os.getenv('SMTP_STARTTLS', 'true').lower() == 'true'
+SMTP_AUTH = os.getenv('SMTP_AUTH', 'true').lower() == 'true'
+SMTP_POOL_SIZE = int(os.getenv('SMTP_POOL_SIZE', '4'))
+MAILER_RATE_LIMIT = float(os.getenv('MAILER_RATE_LIMIT', '10'))  # messages per second, 0 = unlimited
+MAILER_MAX_ATTEMPTS = int(os.getenv('MAILER_MAX_ATTEMPTS', '5'))
+MAILER_RETRY_BASE_SECONDS = float(os.getenv('MAILER_RETRY_BASE_SECONDS', '30'))
+MAILER_RETRY_MAX_SECONDS = float(os.getenv('MAILER_RETRY_MAX_SECONDS', '900'))
+MAILER_SHARDS = int(os.getenv('MAILER_SHARDS', '1'))  # sender processes, 1 = send in-process
+
+# Writer
+# 'llm' asks the model for the whole HTML; 'template' only asks for the intro
+WRITER_RENDER_MODE = os.getenv('WRITER_RENDER_MODE', 'llm')
+# Stream llm-mode output to a partial file that the app previews while generating
+WRITER_STREAM = os.getenv('WRITER_STREAM', 'true').lower() == 'true'
+# Store every issue gzip-compressed under data/archive with an index.jsonl
+ARCHIVE_ENABLED = os.getenv('ARCHIVE_ENABLED', 'true').lower() == 'true'
+
+# Fetcher
+NEWSAPI_ENDPOINT = os.getenv('NEWSAPI_ENDPOINT', 'https://newsapi.org/v2/everything')
+FETCHER_MAX_WORKERS = int(os.getenv('FETCHER_MAX_WORKERS', '8'))
+NEWSAPI_CACHE_TTL_SECONDS = int(os.getenv('NEWSAPI_CACHE_TTL_SECONDS', '900'))
+# Articles per request and pages per query fetched by each workflow run
+FETCH_PAGE_SIZE = int(os.getenv('FETCH_PAGE_SIZE', '20'))
+FETCH_PAGES = int(os.getenv('FETCH_PAGES', '1'))
+# Sub-topic queries fetched alongside the topic: a JSON list (for TOPIC), or an
+# object mapping topic -> list, e.g. {"Artificial Intelligence": ["LLM", "AI chips"]}
+FETCH_QUERIES = os.getenv('FETCH_QUERIES', '')
+FETCH_ARCHIVE_ENABLED = os.getenv('FETCH_ARCHIVE_ENABLED', 'true').lower() == 'true'
+FETCH_ARCHIVE_RETENTION_DAYS = int(os.getenv('FETCH_ARCHIVE_RETENTION_DAYS', '30'))
+
+# Deduplication (estimated Jaccard similarity of title + description shingles)
+DEDUP_THRESHOLD = float(os.getenv('DEDUP_THRESHOLD', '0.5'))
+
+# Validator (local overlap/number/length score; summaries below it are re-summarized)
+VALIDATOR_MIN_SCORE = float(os.getenv('VALIDATOR_MIN_SCORE', '0.25'))
+VALIDATOR_RESUMMARIZE = os.getenv('VALIDATOR_RESUMMARIZE', 'true').lower() == 'true'
+
+# Categorizer (cosine similarity to section vocabularies; below this -> "Top Stories")
+CATEGORIZER_MIN_SCORE = float(os.getenv('CATEGORIZER_MIN_SCORE', '0.05'))
+
+# Workflow
+# Unfinished runs older than this are abandoned instead of resumed (0 = always resume)
+WORKFLOW_RESUME_MAX_AGE_HOURS = float(os.getenv('WORKFLOW_RESUME_MAX_AGE_HOURS', '12'))
+
+# Scheduler
+# JSON list of jobs, e.g. [{"topic": "Robotics", "hour": 7, "minute": 30, "mailer_shards": 2}].
+# Jobs may also set "queries", "pages" and "page_size" to override the fetcher settings.
+# Any APScheduler cron field (hour, minute, day_of_week, ...) may be set per job.
+# Empty = one job for TOPIC every day at 9:00.
+SCHEDULED_TOPICS = os.getenv('SCHEDULED_TOPICS', '')
+SCHEDULER_EXECUTOR = os.getenv('SCHEDULER_EXECUTOR', 'thread')  # 'thread' or 'process'
+SCHEDULER_MAX_WORKERS = int(os.getenv('SCHEDULER_MAX_WORKERS', '4'))
+SCHEDULER_MISFIRE_GRACE_SECONDS = int(os.getenv('SCHEDULER_MISFIRE_GRACE_SECONDS', '3600'))
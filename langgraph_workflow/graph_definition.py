@@ -1,47 +1,303 @@
 # langgraph_workflow/graph_definition.py
 
+import sqlite3
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, TypedDict
 from utils.logger import setup_logger
-
-# Import agents
-from agents.fetcher_agent import run_fetcher
-from agents.summarizer_agent import summarize_articles
-from agents.writer_agent import generate_newsletter
-from agents.mailer_agent import run_mailer
+from utils.metrics import start_run, finish_run
 
 logger = setup_logger("workflow")
 
-def run_newsletter_workflow():
+CHECKPOINT_DB = Path("data/cache/workflow_checkpoints.sqlite3")
+CHECKPOINT_DB.parent.mkdir(parents=True, exist_ok=True)
+
+
+class NewsletterState(TypedDict, total=False):
+    articles_fetched: int
+    articles: List[dict]
+    summaries: List[dict]
+    categories: Dict[str, str]
+    newsletter_html: str
+    subscriber_count: int
+    emails_sent: bool
+
+
+# --- Nodes ---
+# Agents are imported when their node runs so importing this module
+# (app.py, main.py, scheduler) doesn't pull in langchain up front.
+# Each node runs inside a metrics stage keyed by the run's thread_id.
+
+def _stage(config, name):
+    return start_run(config["configurable"]["thread_id"]).stage(name)
+
+
+def _topic(config):
+    return config["configurable"].get("topic")
+
+
+def fetch_node(state: NewsletterState, config) -> NewsletterState:
+    with _stage(config, "fetch") as items:
+        from agents.fetcher_agent import queries_for_topic, run_fetcher
+        from config.settings import FETCH_PAGE_SIZE, FETCH_PAGES
+        # Per-run overrides (e.g. from a scheduled job) fall back to the fetcher settings
+        options = config["configurable"].get("fetch") or {}
+        queries = queries_for_topic(_topic(config), extra=options.get("queries"))
+        logger.info(f"Step 1: Fetching news for '{_topic(config)}' ({len(queries)} queries)...")
+        articles = run_fetcher(
+            query=queries,
+            page_size=options.get("page_size") or FETCH_PAGE_SIZE,
+            pages=options.get("pages") or FETCH_PAGES,
+        )
+        logger.info(f"Fetched {len(articles)} articles successfully.")
+        items["articles"] = len(articles)
+    return {"articles_fetched": len(articles), "articles": articles}
+
+
+def dedup_node(state: NewsletterState, config) -> NewsletterState:
+    with _stage(config, "dedup") as items:
+        # Collapse near-duplicate (syndicated) stories
+        from agents.dedup_agent import dedupe_articles
+        from config.settings import DEDUP_THRESHOLD
+        articles = dedupe_articles(state["articles"], threshold=DEDUP_THRESHOLD)
+        logger.info(f"{len(articles)} unique stories after deduplication.")
+        items["articles"] = len(articles)
+    return {"articles": articles}
+
+
+def summarize_node(state: NewsletterState, config) -> NewsletterState:
+    with _stage(config, "summarize") as items:
+        logger.info("Step 2: Summarizing articles...")
+        from agents.summarizer_agent import summarize_articles
+        summaries = summarize_articles(state["articles"])
+        logger.info(f"Generated {len(summaries)} summaries.")
+        items["summaries"] = len(summaries)
+    return {"summaries": summaries}
+
+
+def validate_node(state: NewsletterState, config) -> NewsletterState:
+    with _stage(config, "validate") as items:
+        from agents.validator_agent import validate_summaries
+        summaries, report = validate_summaries(state["summaries"], state["articles"])
+        logger.info(f"Validated summaries: {report}")
+        items.update(report)
+    return {"summaries": summaries}
+
+
+def categorize_node(state: NewsletterState, config) -> NewsletterState:
+    # Local classifier, runs alongside summarize
+    with _stage(config, "categorize") as items:
+        from agents.categorizer_agent import categorize_articles
+        categories = categorize_articles(state["articles"])
+        items["articles"] = len(categories)
+        items["sections"] = len(set(categories.values()))
+    return {"categories": categories}
+
+
+def write_node(state: NewsletterState, config) -> NewsletterState:
+    with _stage(config, "write") as items:
+        logger.info("Step 3: Creating newsletter...")
+        from agents.writer_agent import generate_newsletter
+        newsletter_html = generate_newsletter(
+            state["summaries"],
+            categories=state.get("categories"),
+            topic=_topic(config),
+            run_id=config["configurable"]["thread_id"],
+        )
+        logger.info("Newsletter HTML generated successfully.")
+        items["html_bytes"] = len(newsletter_html.encode("utf-8"))
+    return {"newsletter_html": newsletter_html}
+
+
+def check_mail_node(state: NewsletterState, config) -> NewsletterState:
+    # Runs alongside fetch/summarize/write so bad mail settings fail fast
+    with _stage(config, "check_mail") as items:
+        from agents.mailer_agent import check_mailer_ready
+        count = check_mailer_ready()
+        logger.info(f"Mailer ready for {count} subscribers.")
+        items["subscribers"] = count
+    return {"subscriber_count": count}
+
+
+def mail_node(state: NewsletterState, config) -> NewsletterState:
+    with _stage(config, "mail") as items:
+        logger.info("Step 4: Sending emails to subscribers...")
+        from agents.mailer_agent import run_mailer, subject_for_topic
+        shards = config["configurable"].get("mailer_shards")
+        # Send the HTML from this run's state; newsletter.html may belong to another topic
+        result = run_mailer(
+            subject=subject_for_topic(_topic(config)),
+            shards=shards,
+            html_content=state.get("newsletter_html"),
+        ) or {}
+        items.update(result)
+        # Fail the node (so the run stays resumable) while sends are deferred
+        # on transient errors, or when nothing at all could be delivered
+        if result.get("deferred") or (result.get("failed") and not result.get("sent")):
+            raise RuntimeError(
+                f"Mail step incomplete: {result.get('sent', 0)} sent, {result.get('failed', 0)} failed "
+                f"({result.get('deferred', 0)} deferred for retry)"
+            )
+        logger.info("Emails sent successfully ✅")
+    return {"emails_sent": True}
+
+
+def build_graph(checkpointer=None):
+    """
+    Wire the pipeline as a LangGraph StateGraph:
+
+                 /-> summarize -> validate --\\
+        fetch -> dedup                       +-> write --\\
+                 \\-> categorize ------------/            |
+        check_mail --------------------------------------+--> mail
+
+    categorize runs in parallel with summarize/validate and check_mail in parallel
+    with the content branch; write and mail wait for their inputs.
+    """
+    from langgraph.graph import StateGraph, START, END
+
+    graph = StateGraph(NewsletterState)
+    graph.add_node("fetch", fetch_node)
+    graph.add_node("dedup", dedup_node)
+    graph.add_node("summarize", summarize_node)
+    graph.add_node("validate", validate_node)
+    graph.add_node("categorize", categorize_node)
+    graph.add_node("write", write_node)
+    graph.add_node("check_mail", check_mail_node)
+    graph.add_node("mail", mail_node)
+
+    graph.add_edge(START, "fetch")
+    graph.add_edge(START, "check_mail")
+    graph.add_edge("fetch", "dedup")
+    graph.add_edge("dedup", "summarize")
+    graph.add_edge("summarize", "validate")
+    graph.add_edge("dedup", "categorize")
+    graph.add_edge(["validate", "categorize"], "write")
+    graph.add_edge(["write", "check_mail"], "mail")
+    graph.add_edge("mail", END)
+
+    return graph.compile(checkpointer=checkpointer)
+
+
+def _open_checkpointer():
+    from langgraph.checkpoint.sqlite import SqliteSaver
+    # Nodes in the same step run on worker threads
+    conn = sqlite3.connect(str(CHECKPOINT_DB), check_same_thread=False)
+    return conn, SqliteSaver(conn)
+
+
+def _unfinished_thread(app, checkpointer, topic, max_age_hours=None) -> Optional[str]:
     """
-    Executes the full newsletter pipeline step by step.
+    Thread ID of the most recent run for `topic` if it stopped before reaching
+    END and started less than `max_age_hours` (default WORKFLOW_RESUME_MAX_AGE_HOURS)
+    ago. An older unfinished run is abandoned, so e.g. a failed Monday run
+    is not resumed by Tuesday's job in place of fetching Tuesday's news.
     """
-    logger.info("🚀 Starting AI Newsletter Workflow...")
+    from config.settings import WORKFLOW_RESUME_MAX_AGE_HOURS
+    max_age_hours = WORKFLOW_RESUME_MAX_AGE_HOURS if max_age_hours is None else max_age_hours
+
+    # LangGraph copies configurable values such as "topic" into checkpoint metadata
+    latest = next(iter(checkpointer.list(None, filter={"topic": topic}, limit=1)), None)
+    if latest is None:
+        return None
+    thread_id = latest.config["configurable"]["thread_id"]
+    thread_config = {"configurable": {"thread_id": thread_id}}
+    snapshot = app.get_state(thread_config)
+    if not snapshot.next:
+        return None
+
+    if max_age_hours:
+        # Checkpoints are listed newest first; the last one is when the run started
+        first = latest
+        for first in checkpointer.list(thread_config):
+            pass
+        started = datetime.fromisoformat(first.checkpoint["ts"])
+        age = datetime.now(timezone.utc) - started
+        if age > timedelta(hours=max_age_hours):
+            logger.warning(
+                f"Abandoning unfinished run {thread_id} for '{topic}' (started {started:%Y-%m-%d %H:%M} UTC, "
+                f"stopped before {', '.join(snapshot.next)}); starting a fresh run."
+            )
+            return None
+    return thread_id
+
 
-    # --- Step 1: Fetch News ---
-    logger.info("Step 1: Fetching AI news...")
-    articles = run_fetcher(page_size=5)
-    logger.info(f"Fetched {len(articles)} articles successfully.")
+def run_newsletter_workflow(resume=True, thread_id=None, mailer_shards=None, on_start=None,
+                            topic=None, fetch=None):
+    """
+    Executes the full newsletter pipeline as a checkpointed LangGraph run.
+
+    Every node's output is checkpointed to CHECKPOINT_DB. With resume=True, a
+    previous run that failed or was interrupted continues from the node that
+    did not complete instead of starting over, unless it started more than
+    WORKFLOW_RESUME_MAX_AGE_HOURS ago. Pass thread_id to resume (or start) a
+    specific run regardless of its age.
+
+    `topic` (default TOPIC) is the NewsAPI query and goes into the email
+    subject. Runs are resumed per topic, so several topics can run side by
+    side in one process. mailer_shards overrides MAILER_SHARDS, the number
+    of processes the mail step sends with. fetch is an optional dict of
+    "queries", "pages" and "page_size" overriding FETCH_QUERIES, FETCH_PAGES
+    and FETCH_PAGE_SIZE for this run. on_start(run_id, resumed), if
+    given, is called once the run ID is known, before the first node runs.
+
+    Per-stage timings, LLM/HTTP/SMTP latencies and token counts are returned
+    under "metrics" and written to data/runs/<run_id>.json and metrics.prom.
+    """
+    from config.settings import TOPIC
+    topic = topic or TOPIC or "Artificial Intelligence"
+    logger.info(f"🚀 Starting AI Newsletter Workflow for '{topic}'...")
 
-    # --- Step 2: Summarize Articles ---
-    logger.info("Step 2: Summarizing articles...")
-    summaries = summarize_articles(articles)
-    logger.info(f"Generated {len(summaries)} summaries.")
+    conn, checkpointer = _open_checkpointer()
+    try:
+        app = build_graph(checkpointer)
 
-    # --- Step 3: Write Newsletter ---
-    logger.info("Step 3: Creating newsletter...")
-    newsletter_html = generate_newsletter(summaries)
-    logger.info("Newsletter HTML generated successfully.")
+        resumed = False
+        if thread_id is None and resume:
+            thread_id = _unfinished_thread(app, checkpointer, topic)
+            resumed = thread_id is not None
+        elif thread_id is not None:
+            snapshot = app.get_state({"configurable": {"thread_id": thread_id}})
+            resumed = bool(snapshot.next)
+        if thread_id is None:
+            thread_id = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
 
-    # --- Step 4: Send Emails ---
-    logger.info("Step 4: Sending emails to subscribers...")
-    run_mailer()
-    logger.info("Emails sent successfully ✅")
+        config = {"configurable": {
+            "thread_id": thread_id,
+            "topic": topic,
+            "mailer_shards": mailer_shards,
+            "fetch": fetch,
+        }}
+        # A resumed run continues its earlier metrics record instead of replacing it
+        metrics = start_run(thread_id, resume=resumed)
+        if on_start is not None:
+            on_start(thread_id, resumed)
+        try:
+            if resumed:
+                pending = app.get_state(config).next
+                logger.info(f"↩️ Resuming run {thread_id} at: {', '.join(pending)}")
+                state = app.invoke(None, config)
+            else:
+                state = app.invoke({}, config)
+        finally:
+            record_path = metrics.write()
+            logger.info(f"Run metrics written to {record_path}")
+            finish_run(thread_id)
+    finally:
+        conn.close()
 
     logger.info("🎉 Newsletter Workflow Completed Successfully!")
 
     return {
-        "articles_fetched": len(articles),
-        "summaries_created": len(summaries),
+        "run_id": thread_id,
+        "topic": topic,
+        "resumed": resumed,
+        "articles_fetched": state.get("articles_fetched", 0),
+        "unique_articles": len(state.get("articles", [])),
+        "summaries_created": len(state.get("summaries", [])),
         "newsletter_path": "data/cache/newsletter.html",
+        "metrics": metrics.to_dict(),
     }
 
 if __name__ == "__main__":
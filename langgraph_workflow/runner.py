@@ -0,0 +1,104 @@
+# langgraph_workflow/runner.py
+# Runs the newsletter workflow on a background thread, one run at a time
+
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from langgraph_workflow.graph_definition import run_newsletter_workflow
+from utils.logger import setup_logger
+from utils.metrics import get_run
+
+logger = setup_logger("runner")
+
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+class WorkflowRunner:
+    """
+    Single-flight background executor for run_newsletter_workflow.
+
+    submit() hands the run to a one-thread pool and returns immediately, so
+    callers (the Streamlit app) never block on the pipeline. While a run is
+    starting or in progress further submits are refused instead of queued,
+    so two users can't trigger overlapping sends. status() returns a
+    snapshot with the run ID and live per-stage metrics for polling.
+    """
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="workflow")
+        self._lock = threading.Lock()
+        self._status = {"state": "idle"}
+        self._metrics = None
+
+    def submit(self, **kwargs):
+        """
+        Start a workflow run with run_newsletter_workflow(**kwargs).
+        Returns (started, status): started is False if a run is already active.
+        """
+        with self._lock:
+            if self._status["state"] in ("starting", "running"):
+                return False, dict(self._status)
+            self._status = {"state": "starting", "run_id": None, "submitted_at": _now()}
+            self._metrics = None
+            self._executor.submit(self._run, kwargs)
+            return True, dict(self._status)
+
+    def _on_start(self, run_id, resumed):
+        with self._lock:
+            self._status.update(state="running", run_id=run_id, resumed=resumed, started_at=_now())
+            # Held so a failed run's stages survive finish_run() dropping it from the registry
+            self._metrics = get_run(run_id)
+
+    def _run(self, kwargs):
+        try:
+            result = run_newsletter_workflow(on_start=self._on_start, **kwargs)
+        except Exception as e:
+            logger.error(f"Background workflow run failed: {e}\n{traceback.format_exc()}")
+            with self._lock:
+                progress = self._metrics.to_dict() if self._metrics is not None else {}
+                self._status.update(state="failed", error=str(e), progress=progress, finished_at=_now())
+            return
+        logger.info(f"Background workflow run {result['run_id']} completed.")
+        with self._lock:
+            self._status.update(state="succeeded", result=result, finished_at=_now())
+
+    def is_running(self):
+        with self._lock:
+            return self._status["state"] in ("starting", "running")
+
+    def status(self):
+        """
+        Snapshot of the latest run: state (idle/starting/running/succeeded/failed),
+        run_id, timestamps, and "progress" - the run's metrics dict, live while
+        running and final once finished - plus "result" or "error" when done.
+        """
+        with self._lock:
+            status = dict(self._status)
+        run_id = status.get("run_id")
+        live = get_run(run_id) if run_id else None
+        if live is not None:
+            status["progress"] = live.to_dict()
+        elif "result" in status:
+            status["progress"] = status["result"].get("metrics", {})
+        # A failed run keeps the "progress" snapshot taken when it failed
+        return status
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+def get_workflow_runner():
+    """Process-wide WorkflowRunner."""
+    global _runner
+    if _runner is None:
+        with _runner_lock:
+            if _runner is None:
+                _runner = WorkflowRunner()
+    return _runner
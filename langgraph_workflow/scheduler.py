@@ -1,41 +1,113 @@
 # langgraph_workflow/scheduler.py
 # Runs the full newsletter workflow automatically on a schedule
+import json
+from apscheduler.executors.pool import ProcessPoolExecutor, ThreadPoolExecutor
 from apscheduler.schedulers.background import BackgroundScheduler
 from datetime import datetime
 from time import sleep
+from config.settings import (
+    TOPIC,
+    SCHEDULED_TOPICS,
+    SCHEDULER_EXECUTOR,
+    SCHEDULER_MAX_WORKERS,
+    SCHEDULER_MISFIRE_GRACE_SECONDS,
+)
 from langgraph_workflow.graph_definition import run_newsletter_workflow
 from utils.logger import setup_logger
 
 logger = setup_logger("scheduler")
 
-def job():
-    """Job to run the complete newsletter workflow."""
-    logger.info("🕒 Scheduled job triggered.")
+# Cron fields used for a topic that doesn't set its own schedule
+DEFAULT_SCHEDULE = {"hour": 9, "minute": 0}
+
+# Job keys passed to the fetch step instead of the cron trigger
+FETCH_OPTIONS = ("queries", "pages", "page_size")
+
+def job(topic=None, mailer_shards=None, fetch=None):
+    """Job to run the complete newsletter workflow for one topic."""
+    logger.info(f"🕒 Scheduled job triggered for '{topic or TOPIC}'.")
     try:
-        result = run_newsletter_workflow()
-        logger.info(f"✅ Workflow completed successfully at {datetime.now()}")
+        result = run_newsletter_workflow(topic=topic, mailer_shards=mailer_shards, fetch=fetch)
+        logger.info(f"✅ Workflow for '{result['topic']}' completed successfully at {datetime.now()}")
         logger.info(f"Result: {result}")
     except Exception as e:
-        logger.error(f"❌ Error during scheduled run: {e}")
+        logger.error(f"❌ Error during scheduled run for '{topic or TOPIC}': {e}")
+
+def load_topic_schedules(raw=SCHEDULED_TOPICS, mailer_shards=None):
+    """
+    Parse SCHEDULED_TOPICS into [{"topic", "mailer_shards", "fetch", "cron"}].
 
-def start_scheduler(run_now=True):
-    """Starts the scheduler for daily execution.
+    Entries are topic strings or objects with "topic", optional
+    "mailer_shards", fetch overrides ("queries", "pages", "page_size") and
+    APScheduler cron fields; topics without cron fields
+    run on DEFAULT_SCHEDULE. `mailer_shards` is the default for entries
+    that don't set their own.
+    """
+    entries = json.loads(raw) if raw and raw.strip() else [TOPIC]
+    schedules = []
+    for entry in entries:
+        entry = {"topic": entry} if isinstance(entry, str) else dict(entry)
+        topic = entry.pop("topic", None) or TOPIC
+        shards = entry.pop("mailer_shards", mailer_shards)
+        fetch = {key: entry.pop(key) for key in FETCH_OPTIONS if key in entry}
+        schedules.append({"topic": topic, "mailer_shards": shards, "fetch": fetch or None,
+                          "cron": entry or dict(DEFAULT_SCHEDULE)})
+    return schedules
+
+def create_scheduler(schedules, run_now=False, executor=None, max_workers=None):
+    """
+    Build a BackgroundScheduler with one cron job per topic.
+
+    Jobs run on a bounded thread (or process) pool. Each topic's job has
+    max_instances=1, so a slow run is never overlapped by the next one, and
+    coalesce=True, so runs missed while the process was down or busy fire
+    once instead of piling up. With run_now, every job is also due
+    immediately and then follows its cron schedule.
+    """
+    executor = executor or SCHEDULER_EXECUTOR
+    max_workers = max_workers or SCHEDULER_MAX_WORKERS
+    pool = ProcessPoolExecutor(max_workers) if executor == "process" else ThreadPoolExecutor(max_workers)
+
+    scheduler = BackgroundScheduler(
+        executors={"default": pool},
+        job_defaults={
+            "coalesce": True,
+            "max_instances": 1,
+            "misfire_grace_time": SCHEDULER_MISFIRE_GRACE_SECONDS,
+        },
+    )
+    for schedule in schedules:
+        options = {"next_run_time": datetime.now()} if run_now else {}
+        scheduler.add_job(
+            job,
+            "cron",
+            id=f"newsletter:{schedule['topic']}",
+            name=f"Newsletter: {schedule['topic']}",
+            kwargs={"topic": schedule["topic"], "mailer_shards": schedule["mailer_shards"],
+                    "fetch": schedule.get("fetch")},
+            **schedule["cron"],
+            **options,
+        )
+    return scheduler
+
+def start_scheduler(run_now=True, mailer_shards=None, schedules=None):
+    """Starts the scheduler with one daily job per topic in SCHEDULED_TOPICS.
 
     Args:
-        run_now (bool): If True, run the job once immediately after starting the scheduler.
+        run_now (bool): If True, run every job once immediately after starting the scheduler.
                         Default True to enable quick testing.
+        mailer_shards (int): Sender processes for the mail step. Defaults to MAILER_SHARDS.
+        schedules (list): Topic schedules as returned by load_topic_schedules().
+                          Defaults to the SCHEDULED_TOPICS setting.
     """
-    scheduler = BackgroundScheduler()
-
-    # Schedule the job at 9:00 AM every day (you can change this time)
-    scheduler.add_job(job, 'cron', hour=9, minute=0)
+    schedules = schedules or load_topic_schedules(mailer_shards=mailer_shards)
+    scheduler = create_scheduler(schedules, run_now=run_now)
 
     scheduler.start()
-    logger.info("🗓️ Scheduler started. Job will run every day at 9:00 AM.")
-
+    for scheduled in scheduler.get_jobs():
+        logger.info(f"🗓️ Scheduled '{scheduled.name}' ({scheduled.trigger}), next run {scheduled.next_run_time}.")
     if run_now:
-        logger.info("⚡ Running initial workflow immediately (run_now=True)...")
-        job()
+        logger.info("⚡ Running initial workflows immediately (run_now=True)...")
 
     try:
         # Keep the process alive so the background scheduler can run jobs
@@ -1 +1,97 @@
 # Handles external API requests like NewsAPI
+# utils/api_utils.py
+
+import os
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DEFAULT_MODEL = "meta-llama/llama-3-8b-instruct"
+DEFAULT_BASE_URL = "https://openrouter.ai/api/v1"
+
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "120"))
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "16"))
+
+_lock = threading.Lock()
+_http_client = None
+_http_async_client = None
+_llms = {}
+_http_session = None
+
+
+def _get_http_clients():
+    """Create the shared keep-alive HTTP clients on first use."""
+    global _http_client, _http_async_client
+    if _http_client is None:
+        import httpx
+
+        limits = httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_CONNECTIONS,
+        )
+        _http_client = httpx.Client(limits=limits, timeout=LLM_TIMEOUT_SECONDS)
+        _http_async_client = httpx.AsyncClient(limits=limits, timeout=LLM_TIMEOUT_SECONDS)
+    return _http_client, _http_async_client
+
+
+def get_llm(model=DEFAULT_MODEL, temperature=0.7, max_tokens=256):
+    """
+    Return a shared ChatOpenAI client for OpenRouter, building it on first use.
+
+    Clients are cached per (model, temperature, max_tokens) and all of them
+    share one HTTP connection pool. langchain is only imported here, so
+    importing an agent module stays cheap until an LLM is actually needed.
+    """
+    key = (model, temperature, max_tokens)
+    llm = _llms.get(key)
+    if llm is not None:
+        return llm
+
+    with _lock:
+        llm = _llms.get(key)
+        if llm is None:
+            api_key = os.getenv("OPENROUTER_API_KEY")
+            base_url = os.getenv("OPENROUTER_BASE_URL", DEFAULT_BASE_URL)
+            if not api_key:
+                raise ValueError("OPENROUTER_API_KEY missing in .env")
+
+            from langchain_openai import ChatOpenAI
+
+            http_client, http_async_client = _get_http_clients()
+            llm = ChatOpenAI(
+                model=model,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                # Report token usage on streamed responses too (for run metrics)
+                stream_usage=True,
+                api_key=api_key,
+                base_url=base_url,
+                http_client=http_client,
+                http_async_client=http_async_client,
+            )
+            _llms[key] = llm
+    return llm
+
+
+def get_http_session():
+    """
+    Return the shared keep-alive requests.Session used for NewsAPI calls.
+
+    The connection pool is sized by HTTP_POOL_SIZE so concurrent fetches reuse
+    TCP/TLS connections instead of opening a new one per request.
+    """
+    global _http_session
+    if _http_session is None:
+        with _lock:
+            if _http_session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _http_session = session
+    return _http_session
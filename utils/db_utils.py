@@ -1 +1,180 @@
 # Reads and updates subscriber data
+# utils/db_utils.py
+
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+
+DB_PATH = Path("data/subscribers.db")
+JSON_PATH = Path("data/subscribers.json")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS subscribers (
+    id INTEGER PRIMARY KEY,
+    email TEXT NOT NULL UNIQUE COLLATE NOCASE,
+    name TEXT,
+    status TEXT NOT NULL DEFAULT 'active',
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_subscribers_status ON subscribers(status);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+class SubscriberStore:
+    """
+    SQLite-backed subscriber list.
+
+    Emails are unique and indexed (case-insensitive), so add/remove/unsubscribe
+    and lookups are single indexed statements; count() is a COUNT(*) over the
+    status index and iter_subscribers() streams rows through a cursor instead
+    of loading the whole list.
+    """
+
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = self._connect()
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def _connect(self):
+        conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    # --- Writes ---
+
+    def add(self, email, name=None):
+        """Add a subscriber, or re-activate and rename an existing one."""
+        self.add_many([(email, name)])
+
+    def add_many(self, rows):
+        """Bulk add (email, name) pairs in one transaction."""
+        now = _now()
+        with self._lock:
+            self._conn.executemany(
+                """
+                INSERT INTO subscribers (email, name, status, created_at, updated_at)
+                VALUES (?, ?, 'active', ?, ?)
+                ON CONFLICT(email) DO UPDATE SET
+                    name = COALESCE(excluded.name, subscribers.name),
+                    status = 'active',
+                    updated_at = excluded.updated_at
+                """,
+                ((email.strip(), name, now, now) for email, name in rows if email),
+            )
+            self._conn.commit()
+
+    def remove(self, email):
+        """Delete a subscriber. Returns True if one was removed."""
+        with self._lock:
+            cur = self._conn.execute("DELETE FROM subscribers WHERE email = ?", (email.strip(),))
+            self._conn.commit()
+        return cur.rowcount > 0
+
+    def unsubscribe(self, email):
+        """Mark a subscriber inactive but keep the record. Returns True if found."""
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE subscribers SET status = 'unsubscribed', updated_at = ? WHERE email = ?",
+                (_now(), email.strip()),
+            )
+            self._conn.commit()
+        return cur.rowcount > 0
+
+    def clear(self):
+        """Delete every subscriber."""
+        with self._lock:
+            self._conn.execute("DELETE FROM subscribers")
+            self._conn.commit()
+
+    # --- Reads ---
+
+    def get(self, email):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT email, name, status FROM subscribers WHERE email = ?", (email.strip(),)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def count(self, status="active"):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM subscribers WHERE status = ?", (status,)
+            ).fetchone()[0]
+
+    def iter_subscribers(self, status="active", batch_size=1000):
+        """Yield {"email", "name"} dicts in id order, fetching `batch_size` rows at a time."""
+        # A dedicated connection keeps the read cursor independent of writers
+        conn = self._connect()
+        try:
+            cur = conn.execute(
+                "SELECT email, name FROM subscribers WHERE status = ? ORDER BY id", (status,)
+            )
+            while True:
+                rows = cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield {"email": row["email"], "name": row["name"]}
+        finally:
+            conn.close()
+
+    # --- Migration ---
+
+    def migrate_from_json(self, json_path=JSON_PATH, force=False):
+        """
+        One-time import of the legacy subscribers.json list.
+        Returns the number of rows read, or 0 if already migrated.
+        """
+        json_path = Path(json_path)
+        with self._lock:
+            done = self._conn.execute(
+                "SELECT value FROM meta WHERE key = 'json_migrated'"
+            ).fetchone()
+        if (done and not force) or not json_path.exists():
+            return 0
+
+        with open(json_path, "r", encoding="utf-8") as f:
+            subscribers = json.load(f)
+        self.add_many((s.get("email"), s.get("name")) for s in subscribers)
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('json_migrated', ?)", (_now(),)
+            )
+            self._conn.commit()
+        return len(subscribers)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_subscriber_store():
+    """Shared store for DB_PATH, importing subscribers.json on first open."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                store = SubscriberStore(DB_PATH)
+                store.migrate_from_json(JSON_PATH)
+                _store = store
+    return _store
@@ -0,0 +1,196 @@
+# Durable outbound mail queue and per-(newsletter, recipient) delivery log
+# utils/delivery_log.py
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+DB_PATH = Path("data/deliveries.db")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS deliveries (
+    newsletter_id TEXT NOT NULL,
+    email TEXT NOT NULL COLLATE NOCASE,
+    name TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (newsletter_id, email)
+);
+CREATE INDEX IF NOT EXISTS idx_deliveries_due
+    ON deliveries(newsletter_id, status, next_attempt_at);
+"""
+
+# Statuses: pending -> sending -> sent | pending (retry) | failed | deferred
+# 'deferred' rows ran out of attempts on transient errors (e.g. SMTP down) and are
+# re-queued by the next run; 'failed' rows were rejected permanently.
+
+
+def _shard_clause(shard):
+    """SQL filter and params restricting rows to shard (index, count), or none."""
+    if shard is None:
+        return "", ()
+    index, count = shard
+    return " AND rowid % ? = ?", (count, index)
+
+
+class DeliveryLog:
+    """
+    SQLite-backed send queue keyed by (newsletter_id, email).
+
+    Every recipient of a newsletter is enqueued once; a row only moves to
+    'sent' after the SMTP server accepted the message, so re-running a job for
+    the same newsletter skips everyone already delivered and picks up pending
+    retries where they left off.
+    """
+
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # Durable across process crashes; only an OS crash can lose the last commits
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def enqueue(self, newsletter_id, subscribers, batch_size=1000):
+        """Add {"email", "name"} recipients not already in the log. Returns rows added."""
+        added = 0
+        batch = []
+
+        def flush():
+            nonlocal added
+            with self._lock:
+                cur = self._conn.executemany(
+                    "INSERT OR IGNORE INTO deliveries (newsletter_id, email, name, updated_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    batch,
+                )
+                self._conn.commit()
+            added += cur.rowcount
+            batch.clear()
+
+        now = time.time()
+        for sub in subscribers:
+            email = sub.get("email")
+            if not email:
+                continue
+            batch.append((newsletter_id, email.strip(), sub.get("name"), now))
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+        return added
+
+    def requeue_inflight(self, newsletter_id):
+        """
+        Return rows left in 'sending' by a crashed job to 'pending'; their
+        outcome is unknown, so they are retried (at-least-once). 'deferred'
+        rows get a fresh set of attempts, so a re-run after an outage
+        resumes the sends that gave up.
+        """
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE deliveries SET status = 'pending', updated_at = ? "
+                "WHERE newsletter_id = ? AND status = 'sending'",
+                (time.time(), newsletter_id),
+            )
+            deferred = self._conn.execute(
+                "UPDATE deliveries SET status = 'pending', attempts = 0, next_attempt_at = 0, "
+                "updated_at = ? WHERE newsletter_id = ? AND status = 'deferred'",
+                (time.time(), newsletter_id),
+            )
+            self._conn.commit()
+        return cur.rowcount + deferred.rowcount
+
+    def claim_due(self, newsletter_id, limit, shard=None):
+        """
+        Atomically mark up to `limit` due pending rows as 'sending' and return them.
+        With shard=(index, count), only rows whose rowid % count == index are claimed,
+        so `count` processes can drain one newsletter without overlapping.
+        """
+        now = time.time()
+        where, params = _shard_clause(shard)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT rowid, email, name, attempts FROM deliveries "
+                "WHERE newsletter_id = ? AND status = 'pending' AND next_attempt_at <= ?"
+                f"{where} ORDER BY rowid LIMIT ?",
+                (newsletter_id, now, *params, limit),
+            ).fetchall()
+            self._conn.executemany(
+                "UPDATE deliveries SET status = 'sending', updated_at = ? WHERE rowid = ?",
+                [(now, row["rowid"]) for row in rows],
+            )
+            self._conn.commit()
+        return [dict(row) for row in rows]
+
+    def mark_sent(self, newsletter_id, email):
+        self._update(newsletter_id, email, "status = 'sent', attempts = attempts + 1, last_error = NULL")
+
+    def mark_retry(self, newsletter_id, email, error, delay):
+        self._update(
+            newsletter_id, email,
+            "status = 'pending', attempts = attempts + 1, last_error = ?, next_attempt_at = ?",
+            (str(error)[:500], time.time() + delay),
+        )
+
+    def mark_failed(self, newsletter_id, email, error, transient=False):
+        self._update(
+            newsletter_id, email,
+            "status = ?, attempts = attempts + 1, last_error = ?",
+            ("deferred" if transient else "failed", str(error)[:500]),
+        )
+
+    def _update(self, newsletter_id, email, assignments, params=()):
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE deliveries SET {assignments}, updated_at = ? "
+                "WHERE newsletter_id = ? AND email = ?",
+                (*params, time.time(), newsletter_id, email),
+            )
+            self._conn.commit()
+
+    def next_due_at(self, newsletter_id, shard=None):
+        """Earliest next_attempt_at among pending rows, or None when nothing is pending."""
+        where, params = _shard_clause(shard)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MIN(next_attempt_at) FROM deliveries "
+                f"WHERE newsletter_id = ? AND status = 'pending'{where}",
+                (newsletter_id, *params),
+            ).fetchone()
+        return row[0]
+
+    def counts(self, newsletter_id):
+        """{status: count} for one newsletter."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM deliveries WHERE newsletter_id = ? GROUP BY status",
+                (newsletter_id,),
+            ).fetchall()
+        return {status: n for status, n in rows}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_log = None
+_log_lock = threading.Lock()
+
+
+def get_delivery_log():
+    """Shared DeliveryLog for DB_PATH."""
+    global _log
+    if _log is None:
+        with _log_lock:
+            if _log is None:
+                _log = DeliveryLog(DB_PATH)
+    return _log
@@ -1 +1,288 @@
 # Handles email sending via SMTP or API
+# utils/email_utils.py
+
+import queue
+import random
+import re
+import smtplib
+import threading
+import time
+import uuid
+from email import quoprimime
+from email.header import Header
+from email.utils import formatdate, make_msgid
+
+
+class SMTPConnectionPool:
+    """
+    Keeps up to `size` authenticated SMTP sessions alive and hands them out
+    to senders, so STARTTLS and LOGIN happen once per session instead of once
+    per message. A session that the server dropped is transparently reopened.
+    """
+
+    def __init__(self, host, port, user=None, password=None, size=4,
+                 starttls=True, timeout=30):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.size = max(1, size)
+        self.starttls = starttls
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self._open = []
+        self._closed = False
+
+    def _connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        server.ehlo()
+        if self.starttls:
+            server.starttls()
+            server.ehlo()
+        if self.user and self.password:
+            server.login(self.user, self.password)
+        with self._lock:
+            self._open.append(server)
+        return server
+
+    def _discard(self, server):
+        with self._lock:
+            if server in self._open:
+                self._open.remove(server)
+        try:
+            server.close()
+        except Exception:
+            pass
+
+    def _acquire(self):
+        self._slots.acquire()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            return self._connect()
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _release(self, server):
+        if server is not None and not self._closed:
+            self._idle.put(server)
+        elif server is not None:
+            self._discard(server)
+        self._slots.release()
+
+    def send_message(self, msg, from_addr=None, to_addrs=None):
+        """Send an email.message.Message over a pooled session."""
+        return self._send(lambda server: server.send_message(msg, from_addr, to_addrs))
+
+    def sendmail(self, from_addr, to_addrs, msg):
+        """Send a pre-rendered message (str or bytes) over a pooled session."""
+        return self._send(lambda server: server.sendmail(from_addr, to_addrs, msg))
+
+    def _send(self, action):
+        server = self._acquire()
+        try:
+            try:
+                return action(server)
+            except smtplib.SMTPServerDisconnected:
+                # Idle sessions get dropped by the server; reconnect once and retry
+                self._discard(server)
+                server = None
+                server = self._connect()
+                return action(server)
+        except (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused):
+            # The server rejected this message, but the session is still usable
+            raise
+        except Exception:
+            if server is not None:
+                self._discard(server)
+                server = None
+            raise
+        finally:
+            self._release(server)
+
+    def close(self):
+        """Quit every open session."""
+        self._closed = True
+        with self._lock:
+            servers, self._open = self._open, []
+        while True:
+            try:
+                self._idle.get_nowait()
+            except queue.Empty:
+                break
+        for server in servers:
+            try:
+                server.quit()
+            except Exception:
+                try:
+                    server.close()
+                except Exception:
+                    pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class RateLimiter:
+    """Thread-safe token bucket allowing `rate` acquisitions per second (0 = unlimited)."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.rate:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+_RETRY_AFTER_RE = re.compile(
+    r"(?:retry[- ]after|try again in)[:\s]*(\d+)\s*(s|sec|seconds?|m|min|minutes?)?",
+    re.IGNORECASE,
+)
+
+
+def classify_smtp_error(error):
+    """
+    Split a send failure into (transient, retry_after_seconds).
+
+    4xx replies, dropped connections and network errors are transient; 5xx
+    replies are permanent. A "Retry-After: N" / "try again in N minutes" hint
+    in the server's reply text is returned when present, else None.
+    """
+    code, text = None, str(error)
+    if isinstance(error, smtplib.SMTPRecipientsRefused) and error.recipients:
+        code, reply = next(iter(error.recipients.values()))
+        text = reply.decode("utf-8", "replace") if isinstance(reply, bytes) else str(reply)
+    elif isinstance(error, smtplib.SMTPResponseException):
+        code = error.smtp_code
+        reply = error.smtp_error
+        text = reply.decode("utf-8", "replace") if isinstance(reply, bytes) else str(reply)
+
+    if code is not None:
+        transient = 400 <= code < 500
+    else:
+        transient = isinstance(error, (smtplib.SMTPServerDisconnected, OSError))
+
+    retry_after = None
+    match = _RETRY_AFTER_RE.search(text)
+    if match:
+        retry_after = int(match.group(1))
+        if (match.group(2) or "s").lower().startswith("m"):
+            retry_after *= 60
+    return transient, retry_after
+
+
+def backoff_delay(attempt, base, maximum, retry_after=None):
+    """Exponential backoff with jitter for the given 1-based attempt, honoring retry_after."""
+    if retry_after is not None:
+        return min(maximum, max(0, retry_after))
+    delay = min(maximum, base * (2 ** (attempt - 1)))
+    return delay * random.uniform(0.5, 1.0)
+
+
+CRLF = "\r\n"
+
+
+def _qp(text):
+    """Quoted-printable encode UTF-8 text with CRLF line endings."""
+    return quoprimime.body_encode(text.encode("utf-8").decode("latin-1"), eol=CRLF)
+
+
+def _header_value(value):
+    value = " ".join(str(value).split())  # no CR/LF header injection
+    if value.isascii():
+        return value
+    return Header(value, "utf-8").encode()
+
+
+class PreparedNewsletter:
+    """
+    An HTML newsletter MIME-encoded once for many recipients.
+
+    The body is split at the line holding `marker`. Everything before and
+    after it is quoted-printable encoded once, together with the multipart
+    structure. render() only builds the headers and encodes the single
+    personalized line, so per-message work doesn't grow with the newsletter.
+    Quoted-printable encodes line by line, so the joined pieces are the same
+    as encoding the whole personalized body.
+    """
+
+    def __init__(self, html_content, subject, from_addr, marker=None, personalize=None):
+        self.from_addr = from_addr
+        self.marker = marker
+        self.personalize = personalize
+        self._subject = _header_value(subject)
+        self._from = _header_value(from_addr or "")
+        # make_msgid() would otherwise resolve the local FQDN on every call
+        self._msgid_domain = (from_addr or "").rpartition("@")[2] or "localhost"
+
+        lines = html_content.split("\n")
+        idx = next(
+            (i for i, line in enumerate(lines) if marker and marker in line),
+            None,
+        )
+        if idx is None:
+            self._marker_line = None
+            self._head, self._tail = _qp(html_content), ""
+        else:
+            self._marker_line = lines[idx]
+            self._head = _qp("\n".join(lines[:idx])) + CRLF if idx else ""
+            self._tail = CRLF + _qp("\n".join(lines[idx + 1:])) if idx + 1 < len(lines) else ""
+
+        boundary = f"==============={uuid.uuid4().hex}=="
+        self._preamble = CRLF.join([
+            "MIME-Version: 1.0",
+            f'Content-Type: multipart/alternative; boundary="{boundary}"',
+            "",
+            f"--{boundary}",
+            'Content-Type: text/html; charset="utf-8"',
+            "MIME-Version: 1.0",
+            "Content-Transfer-Encoding: quoted-printable",
+            "",
+            "",
+        ]).encode("ascii")
+        self._head_bytes = self._head.encode("ascii")
+        self._tail_bytes = self._tail.encode("ascii")
+        self._epilogue = f"{CRLF}--{boundary}--{CRLF}".encode("ascii")
+
+    def render(self, to_email, name=None):
+        """Full RFC 5322 message bytes for one recipient."""
+        headers = CRLF.join([
+            f"From: {self._from}",
+            f"To: {_header_value(to_email)}",
+            f"Subject: {self._subject}",
+            f"Date: {formatdate(localtime=True)}",
+            f"Message-ID: {make_msgid(domain=self._msgid_domain)}",
+            "",
+        ]).encode("ascii")
+
+        if self._marker_line is None:
+            middle = b""
+        else:
+            line = self._marker_line
+            if self.personalize is not None:
+                line = line.replace(self.marker, self.personalize(name))
+            middle = _qp(line).encode("ascii")
+
+        return b"".join([headers, self._preamble, self._head_bytes, middle, self._tail_bytes, self._epilogue])
@@ -0,0 +1,193 @@
+# Append-only, day-segmented archive of raw API responses
+# utils/fetch_archive.py
+
+import gzip
+import json
+import mmap
+import os
+import threading
+import uuid
+import zlib
+from datetime import datetime, timedelta
+from pathlib import Path
+from config.settings import FETCH_ARCHIVE_RETENTION_DAYS
+
+FETCH_ARCHIVE_DIR = Path("data/raw")
+
+# Fast compression: raw responses are written on every fetch, read rarely
+COMPRESS_LEVEL = 3
+
+
+try:
+    import fcntl
+
+    def _lock_file(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+    def _unlock_file(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+except ImportError:  # Windows: appends are only serialized within the process
+    def _lock_file(f):
+        pass
+
+    def _unlock_file(f):
+        pass
+
+
+def _segment_name(day):
+    return day.strftime("%Y-%m-%d")
+
+
+class FetchArchive:
+    """
+    Raw API responses appended to one gzip JSON-lines segment per day.
+
+    Each response is compressed as its own gzip member and appended to
+    <YYYY-MM-DD>.jsonl.gz, so the segment is still a valid gzip stream
+    (`zcat` or iter_segment() read it end to end) while a single record can
+    be decompressed from its byte range alone. <YYYY-MM-DD>.idx.jsonl holds
+    one line per record (id, time, query, page, offset, length, raw bytes);
+    read() uses it to memory-map the segment and inflate just that record.
+
+    Writes are appends to two files under a thread lock plus an exclusive
+    flock on the segment (shared across processes), with compact JSON and a
+    low compression level, so archiving stays cheap enough to leave on.
+    Segments older than `retention_days` are deleted when a new day's
+    segment is started.
+    """
+
+    def __init__(self, directory=FETCH_ARCHIVE_DIR, retention_days=30):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.retention_days = retention_days
+        self._lock = threading.Lock()
+        self._current_day = None
+
+    def _paths(self, day):
+        name = day if isinstance(day, str) else _segment_name(day)
+        return self.directory / f"{name}.jsonl.gz", self.directory / f"{name}.idx.jsonl"
+
+    def append(self, response, query=None, page=None, fetched_at=None):
+        """Compress and append one response; returns its index entry."""
+        fetched_at = fetched_at or datetime.now()
+        day = _segment_name(fetched_at)
+        record_id = f"{fetched_at.strftime('%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        raw = (json.dumps(response, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+        member = gzip.compress(raw, compresslevel=COMPRESS_LEVEL, mtime=0)
+        segment_path, index_path = self._paths(day)
+
+        with self._lock:
+            if day != self._current_day:
+                self._current_day = day
+                self._prune(fetched_at)
+            with open(segment_path, "ab") as f:
+                # Other processes (e.g. the scheduler's process pool) append to
+                # the same segment; the lock keeps offset and write together
+                _lock_file(f)
+                try:
+                    offset = os.fstat(f.fileno()).st_size
+                    f.write(member)
+                    f.flush()
+                finally:
+                    _unlock_file(f)
+            entry = {
+                "id": record_id,
+                "segment": day,
+                "fetched_at": fetched_at.isoformat(timespec="seconds"),
+                "query": query,
+                "page": page,
+                "articles": len(response.get("articles") or []) if isinstance(response, dict) else None,
+                "offset": offset,
+                "length": len(member),
+                "raw_bytes": len(raw),
+            }
+            # The record is written before its index line, so every indexed range is complete
+            with open(index_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        return entry
+
+    def _prune(self, now):
+        if not self.retention_days:
+            return
+        cutoff = _segment_name(now - timedelta(days=self.retention_days))
+        for path in self.directory.glob("*.jsonl.gz"):
+            day = path.name[: -len(".jsonl.gz")]
+            if day < cutoff:
+                for old in self._paths(day):
+                    try:
+                        old.unlink()
+                    except FileNotFoundError:
+                        pass
+
+    def segments(self):
+        """Archived days (YYYY-MM-DD), oldest first."""
+        return sorted(p.name[: -len(".jsonl.gz")] for p in self.directory.glob("*.jsonl.gz"))
+
+    def entries(self, day=None, query=None):
+        """Index entries for one day (default: every day), optionally filtered by query."""
+        days = [day if isinstance(day, str) else _segment_name(day)] if day else self.segments()
+        for name in days:
+            index_path = self._paths(name)[1]
+            if not index_path.exists():
+                continue
+            with open(index_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line from a crash
+                    if query is None or entry.get("query") == query:
+                        yield entry
+
+    def get(self, record_id, day=None):
+        for entry in self.entries(day):
+            if entry["id"] == record_id:
+                return entry
+        return None
+
+    def read(self, entry, day=None):
+        """One archived response (entry dict or id), inflated from its byte range."""
+        entry = self.get(entry, day) if isinstance(entry, str) else entry
+        if entry is None:
+            return None
+        segment_path = self._paths(entry["segment"])[0]
+        with open(segment_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            member = mm[entry["offset"]: entry["offset"] + entry["length"]]
+        # wbits=31: a single gzip member, header and trailer included
+        return json.loads(zlib.decompress(member, wbits=31))
+
+    def iter_segment(self, day):
+        """Stream every response in a day's segment without the index."""
+        segment_path = self._paths(day)[0]
+        if not segment_path.exists():
+            return
+        try:
+            with gzip.open(segment_path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    yield json.loads(line)
+        except (EOFError, OSError, zlib.error, ValueError):
+            # A record torn by a crash; everything before it has been yielded
+            return
+
+    def stats(self):
+        """Record count and raw / stored byte totals across all segments."""
+        records = raw_bytes = 0
+        for entry in self.entries():
+            records += 1
+            raw_bytes += entry.get("raw_bytes") or 0
+        stored = sum(os.path.getsize(self._paths(day)[0]) for day in self.segments())
+        return {"records": records, "raw_bytes": raw_bytes, "stored_bytes": stored}
+
+
+_archive = None
+_archive_lock = threading.Lock()
+
+
+def get_fetch_archive():
+    """Shared FetchArchive for FETCH_ARCHIVE_DIR."""
+    global _archive
+    if _archive is None:
+        with _archive_lock:
+            if _archive is None:
+                _archive = FetchArchive(FETCH_ARCHIVE_DIR, retention_days=FETCH_ARCHIVE_RETENTION_DAYS)
+    return _archive
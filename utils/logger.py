@@ -1,27 +1,189 @@
 # Sets up logging
 # utils/logger.py
 
+import atexit
+import contextvars
+import json
 import logging
-from datetime import datetime
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
+from config.settings import LOG_FORMAT, LOG_RETENTION_DAYS
 
 LOG_DIR = Path("data/logs")
 LOG_DIR.mkdir(parents=True, exist_ok=True)
 
+_run_id = contextvars.ContextVar("log_run_id", default=None)
+_stage = contextvars.ContextVar("log_stage", default=None)
+
+_queue_handler = None
+_listener = None
+_listener_pid = None
+_lock = threading.Lock()
+
+
+@contextmanager
+def log_context(run_id=None, stage=None):
+    """Tag log records emitted in this context with a run ID and/or pipeline stage."""
+    tokens = []
+    if run_id is not None:
+        tokens.append((_run_id, _run_id.set(run_id)))
+    if stage is not None:
+        tokens.append((_stage, _stage.set(stage)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+class _ContextFilter(logging.Filter):
+    # Runs in the caller's thread before the record is queued, so its contextvars apply
+    def filter(self, record):
+        record.run_id = _run_id.get()
+        record.stage = _stage.get()
+        return True
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, message, run_id, stage (+ exc)."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "run_id": getattr(record, "run_id", None),
+            "stage": getattr(record, "stage", None),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class DailyFileHandler(logging.FileHandler):
+    """
+    Appends to LOG_DIR/YYYY-MM-DD.log for the day each record was created.
+
+    Nothing is ever renamed: when the date changes the handler just opens
+    the next day's file in append mode, so several processes (the app, the
+    scheduler, mailer shards) can log to the same files without one
+    rotation clobbering another's. Files older than `retention_days` are
+    deleted when a process switches to a new day.
+    """
+
+    def __init__(self, directory=LOG_DIR, retention_days=30):
+        self.directory = Path(directory)
+        self.retention_days = retention_days
+        self._day = datetime.now().strftime("%Y-%m-%d")
+        super().__init__(self.directory / f"{self._day}.log", mode="a", encoding="utf-8", delay=True)
+        self.prune()
+
+    def emit(self, record):
+        day = datetime.fromtimestamp(record.created).strftime("%Y-%m-%d")
+        if day != self._day:
+            if self.stream is not None:
+                self.stream.close()
+                self.stream = None
+            self._day = day
+            self.baseFilename = os.path.abspath(self.directory / f"{day}.log")
+            self.prune()
+        super().emit(record)
+
+    def prune(self):
+        """Delete per-day files older than retention_days (0 keeps everything)."""
+        if not self.retention_days:
+            return
+        cutoff = (datetime.now() - timedelta(days=self.retention_days)).strftime("%Y-%m-%d")
+        for path in self.directory.glob("????-??-??.log"):
+            if path.stem < cutoff:
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass  # another process got there first
+
+
+def _start_listener():
+    """Start the shared queue listener that owns the per-day file handler."""
+    global _queue_handler, _listener, _listener_pid
+    file_handler = DailyFileHandler(LOG_DIR, retention_days=LOG_RETENTION_DAYS)
+    if LOG_FORMAT == "json":
+        file_handler.setFormatter(JSONFormatter())
+    else:
+        file_handler.setFormatter(logging.Formatter(
+            "%(asctime)s | %(levelname)s | %(message)s", "%Y-%m-%d %H:%M:%S"
+        ))
+
+    if _queue_handler is None:
+        _queue_handler = QueueHandler(queue.SimpleQueue())
+        _queue_handler.addFilter(_ContextFilter())
+    _listener = QueueListener(_queue_handler.queue, file_handler, respect_handler_level=True)
+    _listener.start()
+    _listener_pid = os.getpid()
+    # multiprocessing workers (spawned or forked) leave via os._exit, which
+    # skips atexit; a finalizer still flushes the queue on their way out
+    from multiprocessing import util
+    util.Finalize(None, stop_logging, exitpriority=10)
+
+
+def stop_logging():
+    """Flush queued records and stop the listener thread (also runs at exit)."""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            for handler in _listener.handlers:
+                handler.close()
+            _listener = None
+
+
+atexit.register(stop_logging)
+
+
+def _restart_after_fork():
+    """
+    This tree's own worker processes (mailer shards, APScheduler's process
+    pool) are spawned and start their own listener on import. This hook is
+    only for code that fork()s after logging was set up, e.g. a
+    multiprocessing pool using the fork start method. Such a child inherits
+    the listener object but not its thread, so records would sit in the
+    queue forever; give it a fresh queue and its own listener.
+    """
+    global _listener, _lock
+    _lock = threading.Lock()
+    _listener = None
+    if _queue_handler is not None:
+        _queue_handler.queue = queue.SimpleQueue()
+        _start_listener()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_after_fork)
+
+
 def setup_logger(name="newsletter_agent"):
-    """Sets up a daily rotating logger."""
-    log_file = LOG_DIR / f"{datetime.now().strftime('%Y-%m-%d')}.log"
-    
+    """
+    Sets up a logger that writes through a shared queue.
+
+    Callers only enqueue records; a single background listener thread does
+    the file I/O, so logging never blocks the pipeline or the mailer's send
+    loop. Records go to one file per day (kept for LOG_RETENTION_DAYS days),
+    and LOG_FORMAT=json switches to JSON lines carrying run_id and stage.
+    """
     logger = logging.getLogger(name)
     logger.setLevel(logging.INFO)
-    
-    # Avoid duplicate handlers
-    if not logger.handlers:
-        file_handler = logging.FileHandler(log_file, encoding="utf-8")
-        formatter = logging.Formatter(
-            "%(asctime)s | %(levelname)s | %(message)s", "%Y-%m-%d %H:%M:%S"
-        )
-        file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
-    
+
+    with _lock:
+        # A listener started in another process (before a fork) has no thread here
+        if _listener is None or _listener_pid != os.getpid():
+            _start_listener()
+        # Avoid duplicate handlers
+        if _queue_handler not in logger.handlers:
+            logger.addHandler(_queue_handler)
+
     return logger
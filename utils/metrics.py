@@ -0,0 +1,333 @@
+# Per-run pipeline metrics: stage timings, LLM latency/tokens, SMTP latency
+# utils/metrics.py
+
+import contextvars
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from utils.logger import log_context
+
+RUNS_DIR = Path("data/runs")
+RUNS_DIR.mkdir(parents=True, exist_ok=True)
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_current = contextvars.ContextVar("run_metrics", default=None)
+_runs = {}
+_runs_lock = threading.Lock()
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[idx]
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram that also keeps raw samples for percentiles."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.samples = []
+        self.sum = 0.0
+        # Summary of observations restored from an earlier attempt's record (no raw samples)
+        self._restored = {"count": 0, "max": 0.0, "p50": 0.0, "p95": 0.0}
+
+    @classmethod
+    def from_dict(cls, data, buckets=LATENCY_BUCKETS):
+        """Rebuild a histogram from to_dict() output; counts, sum and max are exact."""
+        hist = cls(buckets)
+        hist.counts = [data.get("buckets", {}).get(str(b), 0) for b in hist.buckets]
+        hist.sum = data.get("sum", 0.0)
+        hist._restored = {key: data.get(key, 0) for key in hist._restored}
+        return hist
+
+    @property
+    def count(self):
+        return len(self.samples) + self._restored["count"]
+
+    def observe(self, value):
+        self.samples.append(value)
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def percentile(self, q):
+        return _percentile(sorted(self.samples), q)
+
+    def to_dict(self):
+        ordered = sorted(self.samples)
+        restored = self._restored
+        # Percentiles come from this attempt's samples when it has any
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "p50": round(_percentile(ordered, 0.50), 6) if ordered else restored["p50"],
+            "p95": round(_percentile(ordered, 0.95), 6) if ordered else restored["p95"],
+            "max": round(max(ordered[-1] if ordered else 0.0, restored["max"]), 6),
+            "buckets": {str(b): c for b, c in zip(self.buckets, self.counts)},
+        }
+
+
+def _labels(**labels):
+    return ",".join(f'{k}="{v}"' for k, v in labels.items())
+
+
+class RunMetrics:
+    """
+    Metrics collected for one workflow run.
+
+    Stages are timed with the stage() context manager, which also makes this
+    object the current_metrics() for agent code running inside it. Agents
+    record LLM calls (via llm_callback()), HTTP requests and SMTP sends.
+
+    A resumed run restores its earlier record first (see restore()), so the
+    run's record covers every attempt rather than only the last one.
+    """
+
+    def __init__(self, run_id):
+        self.run_id = run_id
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        self.stages = {}
+        self.llm_latency = {}
+        self.llm_tokens = {}
+        self.llm_errors = {}
+        self.http_latency = Histogram()
+        self.smtp_latency = Histogram()
+        self.smtp_failures = 0
+        self.attempts = 1
+        self._lock = threading.Lock()
+
+    def restore(self, record):
+        """
+        Merge a previous attempt's record (to_dict() output) into this run.
+        Stages that completed then are kept with status "restored", since
+        their output comes from the checkpoint; LLM, HTTP and SMTP counters
+        carry over and keep accumulating.
+        """
+        with self._lock:
+            self.started_at = record.get("started_at", self.started_at)
+            self.attempts = record.get("attempts", 1) + 1
+            for name, info in record.get("stages", {}).items():
+                if info.get("status") in ("ok", "restored"):
+                    self.stages[name] = dict(info, status="restored", items=dict(info.get("items", {})))
+            for stage, info in record.get("llm", {}).items():
+                self.llm_latency[stage] = Histogram.from_dict(info.get("latency", {}))
+                self.llm_tokens[stage] = {
+                    "prompt": info.get("prompt_tokens", 0),
+                    "completion": info.get("completion_tokens", 0),
+                }
+                if info.get("errors"):
+                    self.llm_errors[stage] = info["errors"]
+            self.http_latency = Histogram.from_dict(record.get("http", {}).get("latency", {}))
+            smtp = record.get("smtp", {})
+            self.smtp_latency = Histogram.from_dict(smtp.get("latency", {}))
+            self.smtp_failures = smtp.get("failures", 0)
+
+    # --- Recording ---
+
+    @contextmanager
+    def stage(self, name):
+        """Time a pipeline stage; the yielded dict collects its item counts."""
+        info = {"status": "running", "items": {}}
+        with self._lock:
+            self.stages[name] = info
+        token = _current.set(self)
+        start = time.perf_counter()
+        try:
+            with log_context(run_id=self.run_id, stage=name):
+                yield info["items"]
+            info["status"] = "ok"
+        except BaseException:
+            info["status"] = "failed"
+            raise
+        finally:
+            info["wall_seconds"] = round(time.perf_counter() - start, 6)
+            _current.reset(token)
+
+    def record_llm_call(self, stage, latency, prompt_tokens=0, completion_tokens=0, error=False):
+        with self._lock:
+            self.llm_latency.setdefault(stage, Histogram()).observe(latency)
+            tokens = self.llm_tokens.setdefault(stage, {"prompt": 0, "completion": 0})
+            tokens["prompt"] += prompt_tokens or 0
+            tokens["completion"] += completion_tokens or 0
+            if error:
+                self.llm_errors[stage] = self.llm_errors.get(stage, 0) + 1
+
+    def record_http_request(self, latency):
+        with self._lock:
+            self.http_latency.observe(latency)
+
+    def record_smtp_send(self, latency, ok=True):
+        with self._lock:
+            self.smtp_latency.observe(latency)
+            if not ok:
+                self.smtp_failures += 1
+
+    def llm_callback(self, stage):
+        """LangChain callback handler that feeds LLM latency and token usage into this run."""
+        return _make_llm_callback(self, stage)
+
+    # --- Export ---
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "run_id": self.run_id,
+                "started_at": self.started_at,
+                "attempts": self.attempts,
+                "stages": {name: dict(info, items=dict(info["items"])) for name, info in self.stages.items()},
+                "llm": {
+                    stage: {
+                        "latency": hist.to_dict(),
+                        "prompt_tokens": self.llm_tokens.get(stage, {}).get("prompt", 0),
+                        "completion_tokens": self.llm_tokens.get(stage, {}).get("completion", 0),
+                        "errors": self.llm_errors.get(stage, 0),
+                    }
+                    for stage, hist in self.llm_latency.items()
+                },
+                "http": {"latency": self.http_latency.to_dict()},
+                "smtp": {"latency": self.smtp_latency.to_dict(), "failures": self.smtp_failures},
+            }
+
+    def to_prometheus(self):
+        """Render the run in Prometheus text exposition format."""
+        data = self.to_dict()
+        run = {"run_id": self.run_id}
+        lines = [
+            "# HELP newsletter_stage_duration_seconds Wall time of each pipeline stage.",
+            "# TYPE newsletter_stage_duration_seconds gauge",
+        ]
+        for name, info in data["stages"].items():
+            if "wall_seconds" in info:
+                lines.append(f"newsletter_stage_duration_seconds{{{_labels(**run, stage=name)}}} {info['wall_seconds']}")
+        lines += [
+            "# HELP newsletter_stage_items Item counts reported by each pipeline stage.",
+            "# TYPE newsletter_stage_items gauge",
+        ]
+        for name, info in data["stages"].items():
+            for item, value in info["items"].items():
+                lines.append(f"newsletter_stage_items{{{_labels(**run, stage=name, item=item)}}} {value}")
+
+        lines += [
+            "# HELP newsletter_llm_tokens_total LLM tokens used per stage.",
+            "# TYPE newsletter_llm_tokens_total counter",
+        ]
+        for stage, info in data["llm"].items():
+            lines.append(f"newsletter_llm_tokens_total{{{_labels(**run, stage=stage, kind='prompt')}}} {info['prompt_tokens']}")
+            lines.append(f"newsletter_llm_tokens_total{{{_labels(**run, stage=stage, kind='completion')}}} {info['completion_tokens']}")
+
+        def histogram(name, hist, **labels):
+            # Bucket counts are already cumulative (see Histogram.observe)
+            out = []
+            for bound, count in zip(hist.buckets, hist.counts):
+                out.append(f"{name}_bucket{{{_labels(**run, **labels, le=bound)}}} {count}")
+            out.append(f"{name}_bucket{{{_labels(**run, **labels, le='+Inf')}}} {hist.count}")
+            out.append(f"{name}_sum{{{_labels(**run, **labels)}}} {round(hist.sum, 6)}")
+            out.append(f"{name}_count{{{_labels(**run, **labels)}}} {hist.count}")
+            return out
+
+        with self._lock:
+            lines += [
+                "# HELP newsletter_llm_call_duration_seconds Latency of individual LLM calls.",
+                "# TYPE newsletter_llm_call_duration_seconds histogram",
+            ]
+            for stage, hist in self.llm_latency.items():
+                lines += histogram("newsletter_llm_call_duration_seconds", hist, stage=stage)
+            lines += [
+                "# HELP newsletter_http_request_duration_seconds Latency of NewsAPI requests.",
+                "# TYPE newsletter_http_request_duration_seconds histogram",
+            ]
+            lines += histogram("newsletter_http_request_duration_seconds", self.http_latency)
+            lines += [
+                "# HELP newsletter_smtp_send_duration_seconds Latency of individual SMTP sends.",
+                "# TYPE newsletter_smtp_send_duration_seconds histogram",
+            ]
+            lines += histogram("newsletter_smtp_send_duration_seconds", self.smtp_latency)
+        return "\n".join(lines) + "\n"
+
+    def write(self, directory=RUNS_DIR):
+        """Write the JSON run record and refresh the Prometheus textfile (latest run)."""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        record_path = directory / f"{self.run_id}.json"
+        with record_path.open("w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        (directory / "metrics.prom").write_text(self.to_prometheus(), encoding="utf-8")
+        return record_path
+
+
+def _make_llm_callback(metrics, stage):
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class LLMMetricsCallback(BaseCallbackHandler):
+        def __init__(self):
+            self._started = {}
+
+        def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+            self._started[run_id] = time.perf_counter()
+
+        def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+            self._started[run_id] = time.perf_counter()
+
+        def on_llm_end(self, response, *, run_id, **kwargs):
+            latency = time.perf_counter() - self._started.pop(run_id, time.perf_counter())
+            usage = (response.llm_output or {}).get("token_usage") or {}
+            prompt_tokens = usage.get("prompt_tokens", 0)
+            completion_tokens = usage.get("completion_tokens", 0)
+            if not usage:
+                # Streaming responses report usage on the message instead
+                for generations in response.generations:
+                    for gen in generations:
+                        meta = getattr(getattr(gen, "message", None), "usage_metadata", None) or {}
+                        prompt_tokens += meta.get("input_tokens", 0)
+                        completion_tokens += meta.get("output_tokens", 0)
+            metrics.record_llm_call(stage, latency, prompt_tokens, completion_tokens)
+
+        def on_llm_error(self, error, *, run_id, **kwargs):
+            latency = time.perf_counter() - self._started.pop(run_id, time.perf_counter())
+            metrics.record_llm_call(stage, latency, error=True)
+
+    return LLMMetricsCallback()
+
+
+def current_metrics():
+    """The RunMetrics of the stage running in this context, or None."""
+    return _current.get()
+
+
+def start_run(run_id, resume=False, directory=RUNS_DIR):
+    """
+    Register (or return the already registered) metrics for a run. With
+    resume=True a new registration first restores the run's earlier record
+    from `directory`, if one was written.
+    """
+    with _runs_lock:
+        run = _runs.get(run_id)
+        if run is None:
+            run = _runs[run_id] = RunMetrics(run_id)
+            record_path = Path(directory) / f"{run_id}.json"
+            if resume and record_path.exists():
+                try:
+                    with record_path.open("r", encoding="utf-8") as f:
+                        run.restore(json.load(f))
+                except (OSError, ValueError):
+                    pass  # unreadable record; this attempt's metrics still get written
+        return run
+
+
+def get_run(run_id):
+    with _runs_lock:
+        return _runs.get(run_id)
+
+
+def finish_run(run_id):
+    """Drop a run from the registry once its record has been written."""
+    with _runs_lock:
+        return _runs.pop(run_id, None)
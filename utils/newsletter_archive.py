@@ -0,0 +1,137 @@
+# Compressed archive of every generated newsletter issue
+# utils/newsletter_archive.py
+
+import gzip
+import json
+import re
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+ARCHIVE_DIR = Path("data/archive")
+INDEX_NAME = "index.jsonl"
+
+# Titles kept in the index so issues can be searched without decompressing them
+INDEX_TITLES = 50
+
+
+def _slug(text):
+    return re.sub(r"[^a-z0-9]+", "-", (text or "").lower()).strip("-")[:40] or "issue"
+
+
+def _write_gz(path, data):
+    # mtime=0 keeps the output byte-identical for identical input
+    with open(path, "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=9, mtime=0) as f:
+            f.write(data)
+    return path.stat().st_size
+
+
+class NewsletterArchive:
+    """
+    Gzip-compressed newsletter issues plus a small JSON-lines index.
+
+    Each issue is stored as YYYY/MM/<id>.html.gz with its summaries in
+    <id>.summaries.json.gz. index.jsonl holds one line per issue (id, date,
+    topic, article count, raw and stored byte sizes, titles), so listing
+    and searching only read the index; an issue is decompressed only when
+    it is previewed.
+    """
+
+    def __init__(self, directory=ARCHIVE_DIR):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.directory / INDEX_NAME
+        self._lock = threading.Lock()
+
+    def add(self, newsletter_html, summaries, topic=None, run_id=None, created_at=None):
+        """Compress and store one issue; returns its index entry."""
+        created_at = created_at or datetime.now()
+        issue_id = f"{created_at.strftime('%Y%m%d-%H%M%S')}-{_slug(topic)}-{uuid.uuid4().hex[:6]}"
+        folder = self.directory / created_at.strftime("%Y") / created_at.strftime("%m")
+        folder.mkdir(parents=True, exist_ok=True)
+
+        html_bytes = newsletter_html.encode("utf-8")
+        summaries_bytes = json.dumps(summaries, ensure_ascii=False).encode("utf-8")
+        html_path = folder / f"{issue_id}.html.gz"
+        summaries_path = folder / f"{issue_id}.summaries.json.gz"
+        stored = _write_gz(html_path, html_bytes) + _write_gz(summaries_path, summaries_bytes)
+
+        entry = {
+            "id": issue_id,
+            "date": created_at.strftime("%Y-%m-%d"),
+            "created_at": created_at.isoformat(timespec="seconds"),
+            "topic": topic,
+            "run_id": run_id,
+            "articles": len(summaries),
+            "html_bytes": len(html_bytes),
+            "stored_bytes": stored,
+            "html_path": html_path.relative_to(self.directory).as_posix(),
+            "summaries_path": summaries_path.relative_to(self.directory).as_posix(),
+            "titles": [s.get("title") for s in summaries[:INDEX_TITLES]],
+        }
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        # Entries are only ever appended; one write per line keeps them whole
+        with self._lock, open(self.index_path, "a", encoding="utf-8") as f:
+            f.write(line)
+        return entry
+
+    def entries(self, topic=None, query=None, limit=None):
+        """
+        Index entries, newest first, optionally filtered by topic and by a
+        case-insensitive substring of the topic or any indexed title.
+        """
+        if not self.index_path.exists():
+            return []
+        query = (query or "").strip().lower()
+        matched = []
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # torn last line from a crash
+                if topic and entry.get("topic") != topic:
+                    continue
+                if query:
+                    haystack = " ".join([entry.get("topic") or ""] + [t or "" for t in entry.get("titles", [])])
+                    if query not in haystack.lower():
+                        continue
+                matched.append(entry)
+        matched.reverse()
+        return matched[:limit] if limit else matched
+
+    def get(self, issue_id):
+        for entry in self.entries():
+            if entry["id"] == issue_id:
+                return entry
+        return None
+
+    def load_html(self, entry):
+        """Decompressed HTML of an issue (entry dict or id)."""
+        entry = self.get(entry) if isinstance(entry, str) else entry
+        with gzip.open(self.directory / entry["html_path"], "rt", encoding="utf-8") as f:
+            return f.read()
+
+    def load_summaries(self, entry):
+        """Summaries list stored with an issue (entry dict or id)."""
+        entry = self.get(entry) if isinstance(entry, str) else entry
+        with gzip.open(self.directory / entry["summaries_path"], "rt", encoding="utf-8") as f:
+            return json.load(f)
+
+
+_archive = None
+_archive_lock = threading.Lock()
+
+
+def get_newsletter_archive():
+    """Shared NewsletterArchive for ARCHIVE_DIR."""
+    global _archive
+    if _archive is None:
+        with _archive_lock:
+            if _archive is None:
+                _archive = NewsletterArchive(ARCHIVE_DIR)
+    return _archive
@@ -0,0 +1,95 @@
+# Two-level (memory + disk) TTL cache for external API responses
+# utils/response_cache.py
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+
+def normalize_params(params):
+    """
+    Canonical form of request params: sorted keys, whitespace-collapsed strings, no Nones.
+    Case is kept: NewsAPI treats upper-case AND/OR/NOT as operators.
+    """
+    normalized = {}
+    for key, value in params.items():
+        if value is None:
+            continue
+        if isinstance(value, str):
+            value = " ".join(value.split())
+        normalized[str(key)] = value
+    return normalized
+
+
+class ResponseCache:
+    """
+    TTL cache for JSON responses keyed by normalized request parameters.
+
+    Lookups go to an in-process dict first and fall back to one JSON file per
+    key under `directory`, so repeated runs in the TTL window (including from
+    a fresh process) are served locally. A ttl of 0 disables caching.
+    """
+
+    def __init__(self, directory, ttl_seconds=900):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self._memory = {}
+        self._lock = threading.Lock()
+
+    def key_for(self, params):
+        blob = json.dumps(normalize_params(params), sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return self.directory / f"{key}.json"
+
+    def get(self, params):
+        """Return the cached response for `params`, or None on a miss or expiry."""
+        if not self.ttl_seconds:
+            return None
+        key = self.key_for(params)
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+        if entry is None:
+            try:
+                with self._path(key).open("r", encoding="utf-8") as f:
+                    stored = json.load(f)
+                entry = (stored["stored_at"], stored["response"])
+            except (OSError, ValueError, KeyError):
+                return None
+            with self._lock:
+                self._memory[key] = entry
+
+        stored_at, response = entry
+        if now - stored_at > self.ttl_seconds:
+            with self._lock:
+                self._memory.pop(key, None)
+            return None
+        return response
+
+    def put(self, params, response):
+        if not self.ttl_seconds:
+            return
+        key = self.key_for(params)
+        stored_at = time.time()
+        with self._lock:
+            self._memory[key] = (stored_at, response)
+
+        # Write-then-rename so concurrent readers never see a partial file
+        path = self._path(key)
+        tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump({"stored_at": stored_at, "response": response}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        for path in self.directory.glob("*.json"):
+            path.unlink(missing_ok=True)
@@ -0,0 +1,130 @@
+# Persistent content-addressed cache for article summaries
+# utils/summary_cache.py
+
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+CACHE_DIR = Path("data/cache")
+CACHE_DIR.mkdir(parents=True, exist_ok=True)
+
+DEFAULT_DB_PATH = CACHE_DIR / "summaries.sqlite3"
+
+
+def summary_cache_key(url, title, content, model, prompt_version):
+    """Hash everything that determines a summary into a stable cache key."""
+    h = hashlib.sha256()
+    for part in (url, title, content, model, prompt_version):
+        h.update((part or "").encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+class SummaryCache:
+    """
+    SQLite-backed summary cache with TTL expiry and size-bounded LRU eviction.
+
+    Entries older than `ttl_seconds` are treated as misses and purged. When the
+    table grows past `max_entries`, the least recently used rows are evicted.
+    Hit/miss counters are kept for the lifetime of the instance.
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, ttl_seconds=7 * 24 * 3600, max_entries=5000):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS summaries (
+                key TEXT PRIMARY KEY,
+                summary TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_summaries_accessed ON summaries(accessed_at)"
+        )
+        self._conn.commit()
+
+    def get_many(self, keys):
+        """Return {key: summary} for every live key, updating LRU timestamps."""
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        now = time.time()
+        found = {}
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                marks = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, summary, created_at FROM summaries WHERE key IN ({marks})",
+                    chunk,
+                ).fetchall()
+                for key, summary, created_at in rows:
+                    if self.ttl_seconds and now - created_at > self.ttl_seconds:
+                        continue
+                    found[key] = summary
+            if found:
+                self._conn.executemany(
+                    "UPDATE summaries SET accessed_at = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+            if self.ttl_seconds:
+                self._conn.execute(
+                    "DELETE FROM summaries WHERE created_at < ?", (now - self.ttl_seconds,)
+                )
+            self._conn.commit()
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def put_many(self, items):
+        """Store (key, summary) pairs and evict least recently used rows over the limit."""
+        items = list(items)
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO summaries (key, summary, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                [(key, summary, now, now) for key, summary in items],
+            )
+            if self.max_entries:
+                self._conn.execute(
+                    """
+                    DELETE FROM summaries WHERE key IN (
+                        SELECT key FROM summaries ORDER BY accessed_at DESC
+                        LIMIT -1 OFFSET ?
+                    )
+                    """,
+                    (self.max_entries,),
+                )
+            self._conn.commit()
+
+    def put(self, key, summary):
+        self.put_many([(key, summary)])
+
+    def stats(self):
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM summaries").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": size}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()